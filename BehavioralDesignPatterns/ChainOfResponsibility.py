@@ -1,6 +1,13 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+from bisect import bisect_left
 from typing import Optional
+import contextlib
+import io
+import random
+import threading
+import time
+from typing import Callable
 
 # --- 1. The Handler Interface (Giao diện chung cho các "mắt xích") ---
 class IHandler(ABC):
@@ -20,6 +27,9 @@ luôn tìm trong đối tượng (self) trước, nếu không thấy mới tìm
 """
 class AbstractHandler(IHandler):
     _next_handler: Optional[IHandler] = None
+    # True nếu lớp cài đặt try_handle() (xử lý riêng, không chuyển tiếp) và handle() của
+    # chính lớp đó = try_handle() + chuyển tiếp. Xem _supports_try_handle().
+    supports_try_handle: bool = False
 
     def set_next(self, handler: IHandler) -> IHandler:
         self._next_handler = handler
@@ -35,9 +45,71 @@ class AbstractHandler(IHandler):
         # Nếu là mắt xích cuối cùng, không làm gì cả.
         return None
 
+    def try_handle(self, request) -> Optional[str]:
+        """
+        Chỉ phần xử lý của riêng mắt xích này, KHÔNG chuyển tiếp.
+        Lớp con override (và đặt supports_try_handle = True) để CompiledChain
+        chạy được mà không đệ quy. Mặc định: không xử lý gì.
+        """
+        return None
+
+    def max_handleable(self) -> Optional[float]:
+        """
+        Khai báo điều kiện "xử lý được": mọi request <= giá trị này đều xử lý được.
+        None nghĩa là không khai báo được, phải gọi try_handle() để biết.
+        """
+        return None
+
+    def handle_batch(self, requests: list) -> list[Optional[str]]:
+        """
+        Xử lý cả lô request. Mỗi mắt xích nhận phần nó xử lý được trong MỘT lượt,
+        chỉ phần còn lại mới đi tiếp xuống dưới. Kết quả giữ đúng thứ tự đầu vào.
+        """
+        results: list[Optional[str]] = [None] * len(requests)
+        pending = list(range(len(requests)))
+        handler = self
+        while handler is not None and pending:
+            if not _supports_try_handle(handler):
+                # Mắt xích "mờ": handle() của nó tự lo phần còn lại của chuỗi
+                for index in pending:
+                    results[index] = handler.handle(requests[index])
+                break
+            pending = handler.try_handle_batch(requests, pending, results)
+            handler = handler._next_handler
+        return results
+
+    def try_handle_batch(self, requests: list, pending: list[int],
+                         results: list[Optional[str]]) -> list[int]:
+        """
+        Xử lý các request tại vị trí `pending`, ghi vào `results`,
+        trả về các vị trí chưa xử lý được. Mặc định gọi try_handle() từng cái.
+        """
+        remaining = []
+        for index in pending:
+            result = self.try_handle(requests[index])
+            if result:
+                results[index] = result
+            else:
+                remaining.append(index)
+        return remaining
+
+def _supports_try_handle(handler: IHandler) -> bool:
+    """
+    try_handle() chỉ thay được handle() khi lớp khai báo supports_try_handle cũng là lớp
+    cung cấp handle() đang dùng: lớp con override handle() (ví dụ chuyển tiếp khoản lớn)
+    mà không tự khai báo lại cờ thì phải chạy handle() gốc của nó.
+    """
+    cls = type(handler)
+    for klass in cls.__mro__:
+        if 'supports_try_handle' in vars(klass):
+            return bool(klass.supports_try_handle) and cls.handle is klass.handle
+    return False
+
 # --- 3. Concrete Handlers (Các "mắt xích" cụ thể) ---
 # Mỗi lớp này sẽ triển khai logic xử lý của riêng nó.
 class Account(AbstractHandler):
+    supports_try_handle = True
+
     def __init__(self, name: str, balance: float):
         self._name = name
         self._balance = balance
@@ -46,14 +118,257 @@ class Account(AbstractHandler):
         """
         Cố gắng xử lý yêu cầu (thanh toán). Nếu không thể, chuyển cho mắt xích tiếp theo.
         """
-        if self._balance >= amount:
+        result = self.try_handle(amount)
+        if result:
             print(f"==> Tài khoản '{self._name}' đã thanh toán ${amount}.")
-            return f"Thanh toán thành công bởi tài khoản {self._name}"
+            return result
         else:
             print(f"Tài khoản '{self._name}' không đủ số dư (còn ${self._balance}). Chuyển tiếp...")
             # Gọi logic "chuyển tiếp" của lớp cha.
             return super().handle(amount)
 
+    def try_handle(self, amount: float) -> Optional[str]:
+        if self._balance >= amount:
+            return f"Thanh toán thành công bởi tài khoản {self._name}"
+        return None
+
+    def max_handleable(self) -> Optional[float]:
+        return self._balance
+
+    def try_handle_batch(self, requests: list, pending: list[int],
+                         results: list[Optional[str]]) -> list[int]:
+        # Account không trừ tiền nên chỉ cần so với số dư, chuỗi kết quả dùng chung
+        balance = self._balance
+        message = f"Thanh toán thành công bởi tài khoản {self._name}"
+        remaining = []
+        for index in pending:
+            if requests[index] <= balance:
+                results[index] = message
+            else:
+                remaining.append(index)
+        return remaining
+
+# --- 3b. Compiled Chain: duyệt chuỗi bằng vòng lặp thay vì đệ quy ---
+# Chuỗi liên kết a -> b -> c được "biên dịch" thành list phẳng. Các mắt xích
+# liên tiếp khai báo max_handleable() được gom thành một đoạn có chỉ mục:
+# mảng max tiền tố (không giảm) cho phép tìm mắt xích ĐẦU TIÊN xử lý được
+# bằng bisect trong O(log n), thay vì hỏi lần lượt từng mắt xích.
+class _IndexedSegment:
+    __slots__ = ('handlers', 'prefix_max')
+
+    def __init__(self, handlers: list[AbstractHandler]):
+        self.handlers = handlers
+        self.prefix_max: list[float] = []
+        self.refresh()
+
+    def refresh(self) -> None:
+        running = float("-inf")
+        prefix_max = []
+        for handler in self.handlers:
+            running = max(running, handler.max_handleable())
+            prefix_max.append(running)
+        self.prefix_max = prefix_max
+
+    def handle(self, request) -> Optional[str]:
+        # bisect cho mắt xích đầu tiên CÓ THỂ xử lý; nếu chỉ mục đã cũ (số dư
+        # giảm sau refresh()) thì mắt xích đó từ chối, phải hỏi tiếp các mắt xích sau.
+        for index in range(bisect_left(self.prefix_max, request), len(self.handlers)):
+            result = self.handlers[index].try_handle(request)
+            if result:
+                return result
+        return None
+
+class CompiledChain:
+    """
+    Chạy một chuỗi AbstractHandler không đệ quy, không in ở mỗi bước.
+    Mắt xích nào không hỗ trợ try_handle() thì từ đó trở đi giao lại cho
+    handle() gốc của nó (vẫn đúng ngữ nghĩa, chỉ không được tối ưu).
+    Nếu số dư/ngưỡng thay đổi, gọi refresh() để cập nhật chỉ mục.
+    """
+    def __init__(self, head: IHandler):
+        self.handlers: list[IHandler] = []
+        self._segments: list = []    # _IndexedSegment hoặc handler đơn lẻ
+        self._tail: IHandler = None  # Handler "mờ" cuối cùng, gọi handle() gốc
+        self._compile(head)
+
+    def _compile(self, head: IHandler) -> None:
+        seen = set()
+        pending_indexed: list[AbstractHandler] = []
+        handler = head
+        while handler is not None:
+            if id(handler) in seen:
+                raise ValueError("Chuỗi trách nhiệm bị vòng lặp")
+            seen.add(id(handler))
+            self.handlers.append(handler)
+
+            if not _supports_try_handle(handler):
+                self._tail = handler
+                break
+            if handler.max_handleable() is not None:
+                pending_indexed.append(handler)
+            else:
+                if pending_indexed:
+                    self._segments.append(_IndexedSegment(pending_indexed))
+                    pending_indexed = []
+                self._segments.append(handler)
+            handler = handler._next_handler
+        if pending_indexed:
+            self._segments.append(_IndexedSegment(pending_indexed))
+
+    def refresh(self) -> None:
+        for segment in self._segments:
+            if isinstance(segment, _IndexedSegment):
+                segment.refresh()
+
+    def handle(self, request) -> Optional[str]:
+        for segment in self._segments:
+            result = segment.handle(request) if isinstance(segment, _IndexedSegment) \
+                else segment.try_handle(request)
+            if result:
+                return result
+        if self._tail is not None:
+            return self._tail.handle(request)
+        return None
+
+# --- 3c. Chuỗi thanh toán an toàn đa luồng, có giao dịch ---
+# Account gốc chỉ đọc _balance mà không trừ tiền. TransactionalAccount kiểm tra
+# và trừ số dư trong cùng một lock (check-and-debit nguyên tử), nên hai luồng
+# không thể cùng tiêu một khoản tiền.
+class TransactionalAccount(Account):
+    def __init__(self, name: str, balance: float):
+        super().__init__(name, balance)
+        self._lock = threading.Lock()
+
+    @property
+    def balance(self) -> float:
+        with self._lock:
+            return self._balance
+
+    def try_debit(self, amount: float) -> bool:
+        with self._lock:
+            if self._balance >= amount:
+                self._balance -= amount
+                return True
+            return False
+
+    def debit_up_to(self, amount: float) -> float:
+        """Trừ tối đa `amount`, trả về số tiền thực sự trừ được."""
+        with self._lock:
+            taken = min(self._balance, amount)
+            self._balance -= taken
+            return taken
+
+    def credit(self, amount: float) -> None:
+        with self._lock:
+            self._balance += amount
+
+    def try_handle(self, amount: float) -> Optional[str]:
+        if self.try_debit(amount):
+            return f"Thanh toán thành công bởi tài khoản {self._name}"
+        return None
+
+    def max_handleable(self) -> Optional[float]:
+        # Số dư thay đổi sau mỗi lần trừ/hoàn tiền nên không đưa vào chỉ mục của CompiledChain
+        return None
+
+    def try_handle_batch(self, requests: list, pending: list[int],
+                         results: list[Optional[str]]) -> list[int]:
+        # Trừ tiền theo đúng thứ tự đầu vào, chỉ lấy lock một lần cho cả lô
+        message = f"Thanh toán thành công bởi tài khoản {self._name}"
+        remaining = []
+        with self._lock:
+            for index in pending:
+                amount = requests[index]
+                if self._balance >= amount:
+                    self._balance -= amount
+                    results[index] = message
+                else:
+                    remaining.append(index)
+        return remaining
+
+class TransactionalChain:
+    """
+    Chạy thanh toán trên một chuỗi TransactionalAccount (đã làm phẳng như CompiledChain).
+    - pay(): tài khoản đầu tiên đủ tiền sẽ bị trừ nguyên khoản.
+    - allow_split=True: nếu không ai đủ một mình, gom dần từ nhiều tài khoản theo thứ tự.
+    - Nếu không gom đủ, hoặc on_commit (ví dụ ghi sổ cái) ném lỗi, mọi khoản đã trừ
+      được hoàn lại (rollback), nên tổng tiền luôn được bảo toàn.
+    Mỗi lúc chỉ giữ một lock nên không thể deadlock.
+    """
+    def __init__(self, head: TransactionalAccount):
+        self.accounts: list[TransactionalAccount] = CompiledChain(head).handlers
+
+    @staticmethod
+    def _rollback(debits: list[tuple[TransactionalAccount, float]]) -> None:
+        for account, amount in reversed(debits):
+            account.credit(amount)
+
+    def pay(self, amount: float, allow_split: bool = False,
+            on_commit: Callable[[list[tuple[TransactionalAccount, float]]], None] = None) -> Optional[str]:
+        debits: list[tuple[TransactionalAccount, float]] = []
+        for account in self.accounts:
+            if account.try_debit(amount):
+                debits.append((account, amount))
+                break
+        else:
+            if not allow_split:
+                return None
+            remaining = amount
+            for account in self.accounts:
+                taken = account.debit_up_to(remaining)
+                if taken:
+                    debits.append((account, taken))
+                    remaining -= taken
+                    if remaining <= 0:
+                        break
+            if remaining > 0:
+                self._rollback(debits) # Không gom đủ tiền -> hoàn lại tất cả
+                return None
+
+        if on_commit is not None:
+            try:
+                on_commit(debits)
+            except Exception:
+                self._rollback(debits)
+                raise
+        names = ", ".join(account._name for account, _ in debits)
+        return f"Thanh toán thành công bởi tài khoản {names}"
+
+    def total_balance(self) -> float:
+        return sum(account.balance for account in self.accounts)
+
+def load_test_transactional_chain(threads: int = 8, payments_per_thread: int = 10_000) -> None:
+    """Nhiều luồng cùng thanh toán; kiểm tra tổng tiền được bảo toàn và đo throughput."""
+    accounts = [TransactionalAccount(f"T{i}", 100_000) for i in range(20)]
+    for current, nxt in zip(accounts, accounts[1:]):
+        current.set_next(nxt)
+    chain = TransactionalChain(accounts[0])
+    initial_total = chain.total_balance()
+    paid = [0] * threads
+
+    def worker(index: int) -> None:
+        rng = random.Random(index)
+        total = 0
+        for _ in range(payments_per_thread):
+            amount = rng.randint(1, 40)
+            if chain.pay(amount, allow_split=rng.random() < 0.2):
+                total += amount
+        paid[index] = total
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    remaining = chain.total_balance()
+    total_payments = threads * payments_per_thread
+    print(f"{total_payments:,} thanh toán / {threads} luồng: {total_payments / elapsed:,.0f} thanh toán/s")
+    print(f"Tổng ban đầu {initial_total:,.0f} = còn lại {remaining:,.0f} + đã trả {sum(paid):,.0f}: "
+          f"{initial_total == remaining + sum(paid)}")
+
 # --- 4. The Client Code ---
 if __name__ == "__main__":
     # Tạo ra các mắt xích
@@ -87,4 +402,85 @@ if __name__ == "__main__":
     # Yêu cầu đi hết chuỗi từ A -> B -> C mà không ai xử lý được.
     result = account_a.handle(1500)
     if not result:
-        print("==> Không có tài khoản nào đủ khả năng thanh toán.\n")
\ No newline at end of file
+        print("==> Không có tài khoản nào đủ khả năng thanh toán.\n")
+
+    print("\n" + "="*40 + "\n")
+
+    # 300 mắt xích: bản đệ quy gốc vẫn còn nằm trong giới hạn stack
+    print("--- CompiledChain: chuỗi 300 tài khoản ---")
+    accounts = [Account(name=f"#{i}", balance=i) for i in range(300)]
+    for current, nxt in zip(accounts, accounts[1:]):
+        current.set_next(nxt)
+    compiled = CompiledChain(accounts[0])
+    print(compiled.handle(250))
+
+    payments = [(i * 37) % 300 for i in range(2000)]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()): # Bản gốc in ở mỗi bước
+        for amount in payments:
+            accounts[0].handle(amount)
+    recursive_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for amount in payments:
+        compiled.handle(amount)
+    compiled_time = time.perf_counter() - start
+    print(f"{len(payments)} thanh toán: đệ quy {recursive_time:.3f}s, compiled {compiled_time:.4f}s")
+
+    # Chuỗi dài hơn giới hạn đệ quy: bản gốc tràn stack, bản compiled vẫn chạy
+    long_chain = [Account(name=f"L{i}", balance=i) for i in range(5000)]
+    for current, nxt in zip(long_chain, long_chain[1:]):
+        current.set_next(nxt)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            long_chain[0].handle(4999)
+    except RecursionError:
+        print("Chuỗi 5.000 mắt xích: handle() đệ quy bị RecursionError")
+    print(f"Chuỗi 5.000 mắt xích: {CompiledChain(long_chain[0]).handle(4999)}")
+
+    print("\n--- TransactionalChain: trừ tiền thật, rollback khi lỗi ---")
+    wallet_a = TransactionalAccount("A", 100)
+    wallet_b = TransactionalAccount("B", 300)
+    wallet_a.set_next(wallet_b)
+    wallet_chain = TransactionalChain(wallet_a)
+    print(wallet_chain.pay(350, allow_split=True))
+    print(f"Số dư sau khi trả chia nhỏ $350: A={wallet_a.balance}, B={wallet_b.balance}")
+
+    def failing_ledger(debits):
+        raise IOError("Không ghi được sổ cái")
+    try:
+        wallet_chain.pay(20, on_commit=failing_ledger)
+    except IOError as error:
+        print(f"Lỗi '{error}' -> đã rollback: A={wallet_a.balance}, B={wallet_b.balance}")
+
+    # CompiledChain trên chuỗi có trừ tiền: phải khớp với duyệt tuần tự từng tài khoản
+    compiled_wallets = [TransactionalAccount(name, balance) for name, balance in (("A", 100), ("B", 50))]
+    compiled_wallets[0].set_next(compiled_wallets[1])
+    compiled_wallet_chain = CompiledChain(compiled_wallets[0])
+    print(f"CompiledChain trừ tiền: {[compiled_wallet_chain.handle(amount) for amount in (80, 40, 30)]}")
+    print(f"Số dư còn lại: {[wallet.balance for wallet in compiled_wallets]} (mong đợi [20, 10])")
+
+    # Lớp con override handle() (khoản > 50 chuyển tiếp): các đường tối ưu phải tôn trọng nó
+    class LimitedAccount(Account):
+        def handle(self, amount: float) -> Optional[str]:
+            if amount > 50:
+                return AbstractHandler.handle(self, amount)
+            return super().handle(amount)
+
+    limited = LimitedAccount("Giới hạn", 100)
+    limited.set_next(Account("Dự phòng", 100))
+    with contextlib.redirect_stdout(io.StringIO()):
+        limited_results = [limited.handle(80), CompiledChain(limited).handle(80), limited.handle_batch([80])[0]]
+    print(f"handle / CompiledChain / handle_batch với LimitedAccount: {limited_results}")
+
+    load_test_transactional_chain()
+
+    print("\n--- handle_batch: quyết toán 100.000 thanh toán một lượt ---")
+    batch = [(i * 7919) % 1200 for i in range(100_000)]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        one_by_one = [account_a.handle(amount) for amount in batch]
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = account_a.handle_batch(batch)
+    batch_time = time.perf_counter() - start
+    print(f"Từng cái: {single_time:.3f}s, theo lô: {batch_time:.3f}s, kết quả giống nhau: {one_by_one == batched}")
@@ -16,19 +16,42 @@ Invoker biết nhấn nút thì thực hiện phương thức của command nào
 
 
 from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from typing import Callable, Iterator
+import os
+import struct
+import threading
+import time
 
 # --- 1. The Receiver (Người thực hiện lệnh) ---
 # Lớp này chứa logic nghiệp vụ thực tế.
 class Light:
     def __init__(self, location: str):
         self.location = location
+        self.is_on = False
 
     def turn_on(self):
+        self.is_on = True
         print(f"Đèn ở '{self.location}' đã bật.")
 
     def turn_off(self):
+        self.is_on = False
         print(f"Đèn ở '{self.location}' đã tắt.")
 
+    # Lệnh hàng loạt: một lời gọi cho cả nhóm đèn (ví dụ một gói tin broadcast)
+    @classmethod
+    def turn_on_many(cls, lights: list['Light']):
+        for light in lights:
+            light.is_on = True
+        print(f"{len(lights)} đèn đã bật.")
+
+    @classmethod
+    def turn_off_many(cls, lights: list['Light']):
+        for light in lights:
+            light.is_on = False
+        print(f"{len(lights)} đèn đã tắt.")
+
 # --- 2. The Command Interface (Giao diện Mệnh lệnh) ---
 class ICommand(ABC):
     @abstractmethod
@@ -42,6 +65,11 @@ class ICommand(ABC):
 # --- 3. Concrete Commands (Các Mệnh lệnh cụ thể) ---
 # Mỗi command sẽ "bọc" một hành động của Receiver.
 class TurnOnCommand(ICommand):
+    # Các lệnh cùng coalesce_key trên cùng receiver: lệnh sau thay thế lệnh trước đang chờ
+    coalesce_key = "power"
+    # Tên phương thức hàng loạt trên lớp receiver (MacroCommand dùng nếu receiver hỗ trợ)
+    bulk_action, bulk_undo_action = "turn_on_many", "turn_off_many"
+
     def __init__(self, light: Light):
         self._light = light
 
@@ -52,6 +80,9 @@ class TurnOnCommand(ICommand):
         self._light.turn_off()
 
 class TurnOffCommand(ICommand):
+    coalesce_key = "power"
+    bulk_action, bulk_undo_action = "turn_off_many", "turn_on_many"
+
     def __init__(self, light: Light):
         self._light = light
 
@@ -61,33 +92,614 @@ class TurnOffCommand(ICommand):
     def undo(self) -> None:
         self._light.turn_on()
 
+# --- 3a. Macro Command: gom nhiều lệnh, gửi theo lô cho từng loại receiver ---
+class MacroCommand(ICommand):
+    """
+    Một lệnh gồm nhiều lệnh con. Các lệnh con LIÊN TIẾP có cùng loại receiver và
+    cùng bulk_action được gửi bằng một lời gọi hàng loạt (ví dụ Light.turn_on_many),
+    nên thứ tự giữa các lệnh vẫn giữ nguyên. Lệnh không hỗ trợ thì chạy từng cái.
+    undo() chạy ngược lại theo đúng thứ tự nhóm, dùng bulk_undo_action.
+    """
+    def __init__(self, commands: list[ICommand],
+                 receiver_of: Callable[[ICommand], object] = lambda command: getattr(command, "_light", None)):
+        self._commands = list(commands)
+        self._receiver_of = receiver_of
+        self._groups = None # Tính một lần ở lần chạy đầu
+
+    def _build_groups(self) -> list:
+        # Mỗi nhóm: (lớp receiver, bulk_action, bulk_undo_action, [receiver...], [command...])
+        groups = []
+        for command in self._commands:
+            receiver = self._receiver_of(command)
+            action = getattr(command, "bulk_action", None)
+            undo_action = getattr(command, "bulk_undo_action", None)
+            receiver_type = type(receiver)
+            # Chỉ dùng API hàng loạt do CHÍNH lớp receiver định nghĩa: lớp con kế thừa
+            # turn_on_many nhưng override turn_on() thì bulk sẽ bỏ qua logic của nó.
+            if action is None or action not in vars(receiver_type):
+                action = None
+            last = groups[-1] if groups else None
+            if (action is not None and last is not None
+                    and last[0] is receiver_type and last[1] == action):
+                last[3].append(receiver)
+                last[4].append(command)
+            else:
+                groups.append((receiver_type, action, undo_action, [receiver], [command]))
+        return groups
+
+    def execute(self) -> None:
+        if self._groups is None:
+            self._groups = self._build_groups()
+        for receiver_type, action, _, receivers, commands in self._groups:
+            if action is None:
+                commands[0].execute()
+            else:
+                getattr(receiver_type, action)(receivers)
+
+    def undo(self) -> None:
+        if self._groups is None:
+            self._groups = self._build_groups()
+        for receiver_type, action, undo_action, receivers, commands in reversed(self._groups):
+            if action is None or undo_action is None or undo_action not in vars(receiver_type):
+                for command in reversed(commands):
+                    command.undo()
+            else:
+                getattr(receiver_type, undo_action)(receivers)
+
+# --- 3b. Lịch sử lệnh gọn nhẹ (undo/redo nhiều cấp) ---
+# Thay vì giữ cả object command, mỗi mục lịch sử chỉ là (opcode, receiver_id):
+# opcode = chỉ số của lớp command, receiver_id = chỉ số của receiver trong bảng.
+# Hai số này được lưu trong hai array kiểu C (6 byte/mục), không phải object Python.
+class CommandCodec:
+    """Chuyển command <-> (opcode, receiver_id). Command được dựng lại lười và dùng chung."""
+    def __init__(self):
+        self._opcodes: dict[type, int] = {}
+        self._command_types: list[tuple[type, str]] = [] # (lớp command, tên thuộc tính receiver)
+        self._receivers: list = []
+        self._receiver_ids: dict[int, int] = {} # id(receiver) -> receiver_id
+        self._decoded: dict[tuple[int, int], ICommand] = {}
+
+    def register_command(self, command_type: type, receiver_attr: str = "_light") -> int:
+        """Command phải dựng lại được bằng command_type(receiver)."""
+        if command_type not in self._opcodes:
+            self._opcodes[command_type] = len(self._command_types)
+            self._command_types.append((command_type, receiver_attr))
+        return self._opcodes[command_type]
+
+    def receiver_id(self, receiver) -> int:
+        key = id(receiver)
+        rid = self._receiver_ids.get(key)
+        if rid is None:
+            rid = self._receiver_ids[key] = len(self._receivers)
+            self._receivers.append(receiver) # Giữ tham chiếu để id() không bị tái sử dụng
+        return rid
+
+    def receiver(self, receiver_id: int):
+        return self._receivers[receiver_id]
+
+    def encode(self, command: ICommand) -> tuple[int, int]:
+        opcode = self._opcodes.get(type(command))
+        if opcode is None:
+            raise TypeError(f"Command '{type(command).__name__}' chưa được register_command()")
+        receiver_attr = self._command_types[opcode][1]
+        return opcode, self.receiver_id(getattr(command, receiver_attr))
+
+    def decode(self, opcode: int, receiver_id: int) -> ICommand:
+        command = self._decoded.get((opcode, receiver_id))
+        if command is None:
+            command_type = self._command_types[opcode][0]
+            command = self._decoded[(opcode, receiver_id)] = command_type(self._receivers[receiver_id])
+        return command
+
+class CommandHistory:
+    """
+    Lịch sử undo/redo dạng ring buffer. push/undo/redo đều O(1).
+    capacity=None: không giới hạn (buffer tự nới khi đầy).
+    capacity=N: giữ N mục gần nhất, mục cũ nhất bị ghi đè.
+    """
+    def __init__(self, codec: CommandCodec, capacity: int = None):
+        self._codec = codec
+        self._capacity = capacity
+        size = capacity if capacity else 16
+        self._opcodes = array('H', bytes(2 * size))
+        self._receiver_ids = array('I', bytes(4 * size))
+        self._start = 0  # Vị trí vật lý của mục cũ nhất
+        self._size = 0   # Số mục đang có (đã làm + có thể redo)
+        self._cursor = 0 # Số mục đã làm; các mục [cursor, size) là redo
+
+    def _physical(self, logical: int) -> int:
+        return (self._start + logical) % len(self._opcodes)
+
+    def _grow(self) -> None:
+        # Trải phẳng ring buffer rồi nhân đôi, chi phí khấu hao O(1) mỗi push
+        order = [self._physical(i) for i in range(self._size)]
+        opcodes = array('H', (self._opcodes[i] for i in order))
+        receiver_ids = array('I', (self._receiver_ids[i] for i in order))
+        opcodes.extend(array('H', bytes(2 * len(order))))
+        receiver_ids.extend(array('I', bytes(4 * len(order))))
+        self._opcodes, self._receiver_ids, self._start = opcodes, receiver_ids, 0
+
+    def validate(self, command: ICommand) -> None:
+        """Ném TypeError nếu command không mã hóa được (chưa register_command())."""
+        self._codec.encode(command)
+
+    def push(self, command: ICommand) -> None:
+        """Ghi lại một command vừa execute(); xóa nhánh redo như mọi trình soạn thảo."""
+        opcode, receiver_id = self._codec.encode(command)
+        self._size = self._cursor
+        if self._size == len(self._opcodes):
+            if self._capacity:
+                # Đầy: bỏ mục cũ nhất
+                self._start = (self._start + 1) % len(self._opcodes)
+                self._size -= 1
+            else:
+                self._grow()
+        index = self._physical(self._size)
+        self._opcodes[index] = opcode
+        self._receiver_ids[index] = receiver_id
+        self._size += 1
+        self._cursor = self._size
+
+    def pop_undo(self) -> ICommand:
+        """Lùi con trỏ và trả về command cần undo (người gọi tự chạy undo()), hoặc None."""
+        if self._cursor == 0:
+            return None
+        self._cursor -= 1
+        index = self._physical(self._cursor)
+        return self._codec.decode(self._opcodes[index], self._receiver_ids[index])
+
+    def pop_redo(self) -> ICommand:
+        """Tiến con trỏ và trả về command cần execute() lại, hoặc None."""
+        if self._cursor == self._size:
+            return None
+        index = self._physical(self._cursor)
+        self._cursor += 1
+        return self._codec.decode(self._opcodes[index], self._receiver_ids[index])
+
+    def undo(self) -> bool:
+        command = self.pop_undo()
+        if command is None:
+            return False
+        command.undo()
+        return True
+
+    def redo(self) -> bool:
+        command = self.pop_redo()
+        if command is None:
+            return False
+        command.execute()
+        return True
+
+    @property
+    def can_undo(self) -> bool:
+        return self._cursor > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return self._cursor < self._size
+
+    def __len__(self) -> int:
+        return self._size
+
+# --- 3c. Invoker bất đồng bộ: hàng đợi + worker pool + gộp lệnh ---
+# Mỗi receiver có hàng đợi riêng và tại một thời điểm chỉ một worker xử lý nó,
+# nên lệnh cho cùng một đèn luôn chạy đúng thứ tự, còn các đèn khác chạy song song.
+# Lệnh mới có cùng coalesce_key với lệnh CHƯA chạy cuối hàng đợi của cùng receiver sẽ thay
+# thế lệnh đó (on/off/on -> chỉ còn on); future của lệnh bị thay hoàn tất cùng lệnh mới.
+class _PendingCommand:
+    __slots__ = ('command', 'futures', 'submitted_at')
+
+    def __init__(self, command: ICommand, future, submitted_at: float):
+        self.command = command
+        self.futures = [future]
+        self.submitted_at = submitted_at
+
+class _CommandWrapper(ICommand):
+    """Lệnh bọc một lệnh khác; invoker xếp hàng theo receiver của lệnh bên trong."""
+    __slots__ = ('command',)
+
+    def __init__(self, command: ICommand):
+        self.command = command
+
+    @property
+    def coalesce_key(self):
+        # Undo đổi cùng một trạng thái với lệnh gốc (bật/tắt) nên gộp chung được
+        return getattr(self.command, "coalesce_key", None)
+
+class _UndoCommand(_CommandWrapper):
+    """Bọc undo() của một command thành execute(), để undo cũng xếp hàng sau các lệnh đang chờ."""
+    __slots__ = ()
+
+    def execute(self) -> None:
+        self.command.undo()
+
+    def undo(self) -> None:
+        self.command.execute()
+
+class _JournaledCommand(_CommandWrapper):
+    """Chạy lệnh (hoặc undo của nó) rồi mới ghi journal: lệnh ném lỗi không bị phát lại."""
+    __slots__ = ('journal', 'is_undo')
+
+    def __init__(self, command: ICommand, journal: 'CommandJournal', is_undo: bool = False):
+        super().__init__(command)
+        self.journal = journal
+        self.is_undo = is_undo
+
+    def execute(self) -> None:
+        if self.is_undo:
+            self.command.undo()
+        else:
+            self.command.execute()
+        self.journal.append(self.command, undo=self.is_undo)
+
+    def undo(self) -> None:
+        _JournaledCommand(self.command, self.journal, not self.is_undo).execute()
+
+class AsyncCommandInvoker:
+    def __init__(self, max_workers: int = 4,
+                 receiver_of: Callable[[ICommand], object] = lambda command: getattr(command, "_light", None)):
+        # Import muộn: chỉ trả giá concurrent.futures khi thật sự dùng chế độ bất đồng bộ
+        from concurrent.futures import Future, ThreadPoolExecutor
+        self._future_type = Future
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._receiver_of = receiver_of
+        self._queues: dict[int, deque] = {}   # id(receiver) -> các lệnh đang chờ
+        self._active: set[int] = set()        # receiver đang có worker xử lý
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock) # Báo khi không còn receiver nào đang chạy
+        # Metrics
+        self._depth = 0
+        self.max_queue_depth = 0
+        self.executed = 0
+        self.coalesced = 0
+        self._latency_total = 0.0 # Từ lúc submit đến lúc chạy xong
+        self.max_latency = 0.0
+
+    def submit(self, command: ICommand):
+        future = self._future_type()
+        target = command
+        while isinstance(target, _CommandWrapper):
+            target = target.command
+        key = id(self._receiver_of(target))
+        coalesce_key = getattr(command, "coalesce_key", None)
+        with self._lock:
+            queue = self._queues.setdefault(key, deque())
+            entry = _PendingCommand(command, future, time.perf_counter())
+            # Chỉ gộp với lệnh CUỐI hàng đợi: gộp với lệnh nằm giữa sẽ cho lệnh mới
+            # vượt qua các lệnh khác của cùng receiver, làm sai thứ tự.
+            if (coalesce_key is not None and queue
+                    and getattr(queue[-1].command, "coalesce_key", None) == coalesce_key):
+                pending = queue.pop()
+                entry.futures[:0] = pending.futures
+                entry.submitted_at = pending.submitted_at
+                self._depth -= 1
+                self.coalesced += 1
+            queue.append(entry)
+            self._depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._depth)
+            if key not in self._active:
+                self._active.add(key)
+                self._executor.submit(self._drain, key)
+        return future
+
+    def _drain(self, key: int) -> None:
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    self._active.discard(key)
+                    del self._queues[key]
+                    if not self._active:
+                        self._idle.notify_all()
+                    return
+                entry = queue.popleft()
+                self._depth -= 1
+            try:
+                entry.command.execute()
+            except BaseException as error:
+                for future in entry.futures:
+                    future.set_exception(error)
+            else:
+                for future in entry.futures:
+                    future.set_result(None)
+            latency = time.perf_counter() - entry.submitted_at
+            with self._lock:
+                self.executed += 1
+                self._latency_total += latency
+                self.max_latency = max(self.max_latency, latency)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._depth,
+                "max_queue_depth": self.max_queue_depth,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "avg_latency_ms": self._latency_total / self.executed * 1000 if self.executed else 0.0,
+                "max_latency_ms": self.max_latency * 1000,
+            }
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Chờ tới khi mọi lệnh đã submit đều chạy xong. Trả về False nếu hết timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+# --- 3d. Nhật ký lệnh bền vững (journal) + snapshot ---
+# File journal chỉ ghi nối (append-only). Mỗi bản ghi: [u32 độ dài][u16 opcode][tên receiver UTF-8].
+# Opcode do người dùng gán cố định (khác CommandCodec) nên đọc lại được sau khi khởi động lại;
+# bit cao nhất của opcode (_UNDO_FLAG) đánh dấu bản ghi là undo() của lệnh đó.
+# Lệnh chỉ được ghi SAU khi chạy thành công, nên phát lại đúng những gì đã thực sự xảy ra.
+# - Group commit: gom nhiều bản ghi rồi mới write + fsync một lần.
+#   Bản ghi còn nằm trong buffer quá group_interval thì một timer tự ghi xuống đĩa.
+# - Snapshot: lưu trạng thái thiết bị + vị trí byte trong journal; khôi phục chỉ cần
+#   nạp snapshot rồi phát lại phần journal phía sau nó.
+class CommandJournal:
+    _HEADER = struct.Struct("<IH") # độ dài payload (gồm opcode), opcode
+    _UNDO_FLAG = 0x8000
+
+    def __init__(self, path: str, group_size: int = 1024, group_interval: float = 0.05,
+                 snapshot_every: int = None, snapshot_provider: Callable[[], dict] = None,
+                 receiver_name: Callable[[object], str] = lambda receiver: receiver.location,
+                 drain: Callable[[], object] = None):
+        if snapshot_every and snapshot_provider is None:
+            raise ValueError("snapshot_every cần snapshot_provider để biết trạng thái cần chụp")
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self._group_size = group_size
+        self._group_interval = group_interval
+        self._snapshot_every = snapshot_every
+        self._snapshot_provider = snapshot_provider
+        self._receiver_name = receiver_name
+        # Gọi trước khi chụp snapshot để không còn lệnh nào đang chạy dở
+        # (ví dụ AsyncCommandInvoker.wait_idle); None = lệnh chạy đồng bộ.
+        # Khi có drain, append() (chạy trên worker) không tự chụp snapshot, người
+        # submit lệnh gọi snapshot_if_due() trước khi submit.
+        self.drain = drain
+        self._opcodes: dict[type, int] = {}
+        self._command_types: dict[int, tuple[type, str]] = {}
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._since_snapshot = 0
+        self._last_sync = time.monotonic()
+        self._timer: threading.Timer = None
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+
+    def register(self, opcode: int, command_type: type, receiver_attr: str = "_light") -> None:
+        if not 0 <= opcode < self._UNDO_FLAG:
+            raise ValueError(f"opcode phải nằm trong [0, {self._UNDO_FLAG})")
+        self._opcodes[command_type] = opcode
+        self._command_types[opcode] = (command_type, receiver_attr)
+
+    def validate(self, command: ICommand) -> None:
+        """Ném TypeError nếu command chưa được register(): kiểm tra trước khi chạy lệnh."""
+        if type(command) not in self._opcodes:
+            raise TypeError(f"Command '{type(command).__name__}' chưa được register()")
+
+    def append(self, command: ICommand, undo: bool = False) -> None:
+        """Ghi một lệnh ĐÃ chạy xong (undo=True: đã chạy undo() của nó)."""
+        self.validate(command)
+        opcode = self._opcodes[type(command)]
+        receiver = getattr(command, self._command_types[opcode][1])
+        name = self._receiver_name(receiver).encode()
+        if undo:
+            opcode |= self._UNDO_FLAG
+        with self._lock:
+            self._buffer += self._HEADER.pack(len(name) + 2, opcode)
+            self._buffer += name
+            self._buffered += 1
+            self._since_snapshot += 1
+            if (self._buffered >= self._group_size
+                    or time.monotonic() - self._last_sync >= self._group_interval):
+                self._flush_locked()
+            elif self._timer is None:
+                # Không có append nào tiếp theo thì timer này vẫn ghi nhóm xuống đĩa đúng hạn
+                self._timer = threading.Timer(self._group_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        # Chạy đồng bộ: lệnh vừa ghi đã có trong trạng thái, snapshot SAU bản ghi là nhất quán
+        if self.drain is None:
+            self.snapshot_if_due()
+
+    def snapshot_if_due(self) -> None:
+        if self._snapshot_every and self._since_snapshot >= self._snapshot_every:
+            self.snapshot()
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._file.closed:
+            return
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            os.fsync(self._file.fileno()) # Một fsync cho cả nhóm bản ghi
+            self._buffer.clear()
+            self._buffered = 0
+        self._last_sync = time.monotonic()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def snapshot(self, state: dict = None) -> None:
+        """Ghi snapshot (ghi file tạm rồi os.replace để không bao giờ hỏng nửa chừng)."""
+        import json
+        if state is None:
+            if self.drain is not None:
+                self.drain()
+            state = self._snapshot_provider()
+        with self._lock:
+            self._flush_locked()
+            offset = self._file.tell()
+            self._since_snapshot = 0
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"offset": offset, "state": state}, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._file.close()
+
+    @classmethod
+    def iter_records(cls, path: str, offset: int = 0, chunk_size: int = 1 << 20,
+                     good_end: list = None) -> Iterator[tuple[int, str]]:
+        """
+        Đọc tuần tự (opcode, tên receiver) từ offset, từng khúc chunk_size byte.
+        Nếu truyền list good_end, khi đọc hết sẽ thêm vào đó vị trí byte ngay sau
+        bản ghi nguyên vẹn cuối cùng.
+        """
+        header = cls._HEADER
+        header_size = header.size
+        with open(path, "rb") as file:
+            file.seek(offset)
+            pending = b""
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    # Phần dư (nếu có) là bản ghi ghi dở lúc sập, bỏ qua
+                    if good_end is not None:
+                        good_end.append(offset)
+                    return
+                data = pending + chunk if pending else chunk
+                position, end = 0, len(data)
+                while position + header_size <= end:
+                    length, opcode = header.unpack_from(data, position)
+                    record_end = position + 4 + length
+                    if record_end > end:
+                        break
+                    yield opcode, data[position + header_size:record_end].decode()
+                    position = record_end
+                offset += position # data bắt đầu tại offset, nên đây là cuối bản ghi nguyên vẹn
+                pending = data[position:]
+
+    def recover(self, resolve_receiver: Callable[[str], object],
+                apply_snapshot: Callable[[dict], None] = None) -> int:
+        """Nạp snapshot mới nhất (nếu có) rồi phát lại journal phía sau. Trả về số lệnh đã phát lại."""
+        import json
+        offset = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as file:
+                snapshot = json.load(file)
+            offset = snapshot["offset"]
+            if apply_snapshot is not None:
+                apply_snapshot(snapshot["state"])
+
+        commands: dict[tuple[int, str], ICommand] = {}
+        replayed = 0
+        good_end: list[int] = []
+        undo_flag = self._UNDO_FLAG
+        for key in self.iter_records(self.path, offset, good_end=good_end):
+            opcode = key[0]
+            command_key = (opcode & ~undo_flag, key[1])
+            command = commands.get(command_key)
+            if command is None:
+                command_type = self._command_types[command_key[0]][0]
+                command = commands[command_key] = command_type(resolve_receiver(key[1]))
+            if opcode & undo_flag:
+                command.undo()
+            else:
+                command.execute()
+            replayed += 1
+        self._truncate_torn_tail(good_end[0])
+        return replayed
+
+    def _truncate_torn_tail(self, good_end: int) -> None:
+        """Cắt bỏ bản ghi ghi dở ở cuối file để các lần append sau không nối vào rác."""
+        with self._lock:
+            self._flush_locked()
+            if os.path.getsize(self.path) > good_end:
+                self._file.truncate(good_end)
+
 # --- 4. The Invoker (Người kích hoạt lệnh) ---
 # Lớp này không biết gì về Light. Nó chỉ biết về ICommand.
 class RemoteControl:
-    def __init__(self):
+    def __init__(self, history: CommandHistory = None, invoker: AsyncCommandInvoker = None,
+                 journal: CommandJournal = None):
         self._on_command: ICommand = None
         self._off_command: ICommand = None
         self._undo_command: ICommand = None # Để theo dõi lệnh cuối cùng
+        self._history = history # Có history thì undo/redo được nhiều cấp
+        self._invoker = invoker # Có invoker thì bấm nút không phải chờ thiết bị
+        self._journal = journal # Có journal thì mọi lệnh được ghi lại để phát lại sau khi khởi động lại
+        if journal is not None and invoker is not None and journal.drain is None:
+            journal.drain = invoker.wait_idle # Snapshot phải chờ các lệnh đã ghi chạy xong
+
+    def _run(self, command: ICommand, undo: bool = False):
+        """
+        Chạy ngay (undo=True: chạy undo()), hoặc đưa vào hàng đợi và trả về Future nếu có invoker.
+        Có journal thì lệnh được ghi sau khi chạy thành công, kể cả undo/redo.
+        """
+        if self._journal is not None:
+            task = _JournaledCommand(command, self._journal, undo)
+        else:
+            task = _UndoCommand(command) if undo else command
+        if self._invoker is not None:
+            if self._journal is not None:
+                self._journal.snapshot_if_due() # Trên luồng gọi, sau drain(), trước khi submit
+            return self._invoker.submit(task)
+        task.execute()
+        return None
 
     def set_command(self, on_command: ICommand, off_command: ICommand):
+        # Kiểm tra ngay lúc gán nút: nếu để tới lúc bấm thì thiết bị đã đổi trạng thái
+        # rồi mới phát hiện lệnh không ghi được vào history/journal.
+        for command in (on_command, off_command):
+            if self._history is not None:
+                self._history.validate(command)
+            if self._journal is not None:
+                self._journal.validate(command)
         self._on_command = on_command
         self._off_command = off_command
 
     def press_on_button(self):
         print("Remote: Nhấn nút ON...")
-        self._on_command.execute()
+        result = self._run(self._on_command)
         self._undo_command = self._on_command # Lưu lại để undo
+        if self._history is not None:
+            self._history.push(self._on_command)
+        return result
 
     def press_off_button(self):
         print("Remote: Nhấn nút OFF...")
-        self._off_command.execute()
+        result = self._run(self._off_command)
         self._undo_command = self._off_command # Lưu lại để undo
+        if self._history is not None:
+            self._history.push(self._off_command)
+        return result
 
     def press_undo_button(self):
         print("Remote: Nhấn nút UNDO...")
+        if self._history is not None:
+            command = self._history.pop_undo()
+            if command is None:
+                print("Remote: Không còn gì để undo.")
+                return None
+            return self._run(command, undo=True)
         if self._undo_command:
-            self._undo_command.undo()
-            self._undo_command = None # Chỉ undo được 1 lần
+            command, self._undo_command = self._undo_command, None # Chỉ undo được 1 lần
+            return self._run(command, undo=True)
+        return None
+
+    def press_redo_button(self):
+        print("Remote: Nhấn nút REDO...")
+        command = self._history.pop_redo() if self._history is not None else None
+        if command is None:
+            print("Remote: Không còn gì để redo.")
+            return None
+        return self._run(command)
 
 # --- 5. The Client Code ---
 if __name__ == "__main__":
@@ -117,4 +729,171 @@ if __name__ == "__main__":
     print("\n--- Thử lại ---")
     remote.press_on_button()
     # Lệnh cuối cùng là BẬT đèn. Undo sẽ TẮT đèn.
-    remote.press_undo_button()
\ No newline at end of file
+    remote.press_undo_button()
+
+    print("\n--- Undo/Redo nhiều cấp với CommandHistory ---")
+    codec = CommandCodec()
+    codec.register_command(TurnOnCommand)
+    codec.register_command(TurnOffCommand)
+    history_remote = RemoteControl(history=CommandHistory(codec, capacity=1000))
+    history_remote.set_command(light_on, light_off)
+    history_remote.press_on_button()
+    history_remote.press_off_button()
+    history_remote.press_on_button()
+    history_remote.press_undo_button() # Tắt
+    history_remote.press_undo_button() # Bật
+    history_remote.press_undo_button() # Tắt
+    history_remote.press_undo_button() # Hết
+    history_remote.press_redo_button() # Bật lại
+
+    print("\n--- Invoker bất đồng bộ: đèn chậm, bấm liên tục ---")
+    class SlowLight(Light):
+        def turn_on(self):
+            time.sleep(0.05)
+            super().turn_on()
+
+        def turn_off(self):
+            time.sleep(0.05)
+            super().turn_off()
+
+    invoker = AsyncCommandInvoker(max_workers=4)
+    slow_lights = [SlowLight(f"Phòng {i}") for i in range(4)]
+    remotes = []
+    for light in slow_lights:
+        remote_async = RemoteControl(invoker=invoker)
+        remote_async.set_command(TurnOnCommand(light), TurnOffCommand(light))
+        remotes.append(remote_async)
+    start = time.perf_counter()
+    futures = []
+    for remote_async in remotes:
+        futures.append(remote_async.press_on_button())  # Chạy ngay
+        futures.append(remote_async.press_on_button())  # Đang chờ...
+        futures.append(remote_async.press_off_button()) # ...bị gộp
+        futures.append(remote_async.press_on_button())  # ...chỉ lệnh này chạy
+    print(f"Bấm xong sau {(time.perf_counter() - start) * 1000:.1f}ms, hàng đợi còn {invoker.queue_depth}")
+    for future in futures:
+        future.result()
+    print(f"Metrics: {invoker.metrics()}")
+
+    # Undo cũng đi qua hàng đợi: chạy SAU lệnh bật còn đang chờ, đèn cuối cùng phải tắt
+    undo_remote = RemoteControl(invoker=invoker)
+    undo_remote.set_command(TurnOnCommand(slow_lights[0]), TurnOffCommand(slow_lights[0]))
+    undo_remote.press_off_button()
+    undo_remote.press_on_button()
+    undo_remote.press_undo_button().result()
+    print(f"Bật rồi undo ngay: đèn '{slow_lights[0].location}' đang bật? {slow_lights[0].is_on}")
+    invoker.shutdown()
+
+    print("\n--- Journal bền vững: ghi, 'sập', khôi phục ---")
+    import contextlib
+    import io
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as folder:
+        journal_path = os.path.join(folder, "lights.journal")
+        house = {name: Light(name) for name in ("Bếp", "Phòng ngủ", "Sân")}
+
+        def light_states() -> dict:
+            return {name: light.is_on for name, light in house.items()}
+
+        journal = CommandJournal(journal_path, snapshot_every=400_000, snapshot_provider=light_states)
+        journal.register(1, TurnOnCommand)
+        journal.register(2, TurnOffCommand)
+        journal_remote = RemoteControl(journal=journal)
+        journal_remote.set_command(TurnOnCommand(house["Bếp"]), TurnOffCommand(house["Bếp"]))
+        journal_remote.press_on_button()
+        journal_remote.press_undo_button() # Undo cũng được ghi, khôi phục xong Bếp vẫn tắt
+
+        # Ghi thật nhiều lệnh (tắt print của đèn để đo cho đúng)
+        commands = [TurnOnCommand(house["Sân"]), TurnOffCommand(house["Sân"]), TurnOnCommand(house["Phòng ngủ"])]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(1_000_000):
+                command = commands[i % 3]
+                command.execute()
+                journal.append(command)
+        journal.close()
+        print(f"Ghi 1.000.000 lệnh: {time.perf_counter() - start:.2f}s, "
+              f"{os.path.getsize(journal_path) / 1e6:.1f}MB, trạng thái: {light_states()}")
+
+        start = time.perf_counter()
+        count = sum(1 for _ in CommandJournal.iter_records(journal_path))
+        elapsed = time.perf_counter() - start
+        print(f"Đọc toàn bộ journal: {count:,} bản ghi, {count / elapsed:,.0f} bản ghi/s")
+
+        # "Khởi động lại": đèn mới, trạng thái trống, khôi phục từ snapshot + phần journal sau nó
+        restarted = {name: Light(name) for name in house}
+
+        def apply_states(state: dict) -> None:
+            for name, is_on in state.items():
+                restarted[name].is_on = is_on
+
+        recovery = CommandJournal(journal_path)
+        recovery.register(1, TurnOnCommand)
+        recovery.register(2, TurnOffCommand)
+        with contextlib.redirect_stdout(io.StringIO()):
+            replayed = recovery.recover(restarted.__getitem__, apply_states)
+        recovery.close()
+        print(f"Khôi phục: phát lại {replayed:,} lệnh sau snapshot, trạng thái: "
+              f"{ {name: light.is_on for name, light in restarted.items()} }")
+
+    print("\n--- MacroCommand: bật/tắt 10.000 đèn ---")
+    many_lights = [Light(f"Đèn {i}") for i in range(10_000)]
+    macro_remote = RemoteControl()
+    macro_remote.set_command(MacroCommand([TurnOnCommand(light) for light in many_lights]),
+                             MacroCommand([TurnOffCommand(light) for light in many_lights]))
+    macro_remote.press_on_button()
+    macro_remote.press_undo_button()
+    print(f"Số đèn đang bật sau undo: {sum(light.is_on for light in many_lights)}")
+
+    # So sánh cùng một khối lượng việc: mỗi đèn chỉ đổi cờ is_on ở cả hai phía,
+    # khác nhau duy nhất là gọi từng lệnh hay một lời gọi hàng loạt.
+    class QuietLight(Light):
+        def turn_on(self):
+            self.is_on = True
+
+        def turn_off(self):
+            self.is_on = False
+
+        @classmethod
+        def turn_on_many(cls, lights: list['Light']):
+            for light in lights:
+                light.is_on = True
+
+        @classmethod
+        def turn_off_many(cls, lights: list['Light']):
+            for light in lights:
+                light.is_on = False
+
+    # Cả hai phía đều đi qua Invoker (RemoteControl): bấm nút cho từng đèn,
+    # hay bấm một lần cho MacroCommand. print của remote bị tắt ở cả hai phía.
+    quiet_lights = [QuietLight(f"Đèn {i}") for i in range(10_000)]
+    single_buttons = [(TurnOnCommand(light), TurnOffCommand(light)) for light in quiet_lights]
+    single_remote = RemoteControl()
+    quiet_macro_remote = RemoteControl()
+    quiet_macro_remote.set_command(MacroCommand([on_command for on_command, _ in single_buttons]),
+                                   MacroCommand([off_command for _, off_command in single_buttons]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        quiet_macro_remote.press_on_button() # Dựng nhóm trước khi đo
+        start = time.perf_counter()
+        for on_command, off_command in single_buttons:
+            single_remote.set_command(on_command, off_command)
+            single_remote.press_on_button()
+        single_time = time.perf_counter() - start
+        start = time.perf_counter()
+        quiet_macro_remote.press_on_button()
+        macro_time = time.perf_counter() - start
+    print(f"Từng lệnh qua RemoteControl: {single_time * 1000:.2f}ms, "
+          f"MacroCommand qua RemoteControl: {macro_time * 1000:.2f}ms")
+
+    # Lớp con override turn_on() nhưng không tự định nghĩa turn_on_many: không đi đường bulk
+    class DeviceLight(Light):
+        calls = 0
+
+        def turn_on(self):
+            DeviceLight.calls += 1
+            super().turn_on()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        MacroCommand([TurnOnCommand(DeviceLight(f"Thiết bị {i}")) for i in range(3)]).execute()
+    print(f"DeviceLight.turn_on() được gọi {DeviceLight.calls} lần qua MacroCommand")
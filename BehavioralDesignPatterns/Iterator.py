@@ -1,4 +1,11 @@
-from collections.abc import Iterable, Iterator
+import heapq
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from itertools import chain, islice
 
 # --- 1. The Iterator (Đối tượng "con trỏ" duyệt) ---
 # Lớp này chứa logic của việc duyệt qua tập hợp.
@@ -7,27 +14,118 @@ Iterator: Là con trỏ hay ngón tay chỉ vào từng phần tử. Nó chứa
 nó biết phần tử hiện tại là gì _position
 làm thế nào để đi tới phần tử tiếp theo
 và khi nào kết thúc StopIteration
+
+Vị trí ở đây là cặp (chỉ số block, vị trí trong block) vì WordCollection
+lưu các từ đã sắp xếp trong nhiều block nhỏ (xem bên dưới).
+Iterator duyệt nửa khoảng [start, stop), xuôi hoặc ngược.
+
+Fail-fast: nếu tập hợp bị thay đổi trong lúc duyệt (version khác lúc tạo iterator)
+thì ném RuntimeError ngay, thay vì lặng lẽ bỏ sót hoặc lặp lại phần tử.
+Muốn vừa duyệt vừa sửa thì duyệt trên collection.snapshot().
 """
 class AlphabeticalOrderIterator(Iterator):
-    def __init__(self, collection: 'WordCollection', reverse: bool = False):
-        self._collection = collection._words
+    def __init__(self, collection: '_SortedWordsView', reverse: bool = False,
+                 start: tuple[int, int] = None, stop: tuple[int, int] = None):
+        self._collection = collection
+        self._expected_version = collection._version
+        self._blocks = collection._blocks
         self._reverse = reverse
-        # Vị trí hiện tại của con trỏ duyệt
-        self._position: int = -1 if reverse else 0
+        self._start_block, self._start_offset = start or (0, 0)
+        self._stop_block, self._stop_offset = stop or (len(self._blocks), 0)
+        if (self._start_block, self._start_offset) > (self._stop_block, self._stop_offset):
+            # Khoảng rỗng (ví dụ low > high)
+            self._stop_block, self._stop_offset = self._start_block, self._start_offset
+        # Vị trí hiện tại của con trỏ duyệt: block kế tiếp sẽ đọc, còn vị trí trong
+        # block hiện tại do một iterator C (iter/reversed của lát cắt block) giữ,
+        # nên mỗi bước không cần tự tăng chỉ số hay bắt IndexError.
+        self._next_block = self._stop_block if reverse else self._start_block
+        self._in_block = iter(())
+
+    def _block_at(self, index: int) -> list[str]:
+        return self._blocks[index] if index < len(self._blocks) else []
+
+    def _load_next_block(self) -> bool:
+        while self._start_block <= self._next_block <= self._stop_block:
+            index = self._next_block
+            self._next_block += -1 if self._reverse else 1
+            block = self._block_at(index)
+            low = self._start_offset if index == self._start_block else 0
+            high = self._stop_offset if index == self._stop_block else len(block)
+            if low < high:
+                part = block[low:high] if low or high != len(block) else block
+                self._in_block = reversed(part) if self._reverse else iter(part)
+                return True
+        return False
 
     def __next__(self):
         """
         Phương thức này được vòng lặp 'for' gọi liên tục.
         Nó trả về phần tử tiếp theo trong tập hợp.
         """
-        try:
-            value = self._collection[self._position]
-            self._position += -1 if self._reverse else 1
-        except IndexError:
-            # Khi không còn phần tử, ném ra StopIteration để báo hiệu kết thúc.
-            raise StopIteration()
-        
-        return value
+        if self._collection._version != self._expected_version:
+            raise RuntimeError("WordCollection đã bị thay đổi trong lúc duyệt")
+        for value in self._in_block:
+            return value
+        while self._load_next_block():
+            for value in self._in_block:
+                return value
+        # Khi không còn phần tử, ném ra StopIteration để báo hiệu kết thúc.
+        raise StopIteration()
+
+class _ImmutableOrderIterator(AlphabeticalOrderIterator):
+    """Cho snapshot và collection trên đĩa: version không bao giờ đổi nên bỏ bước kiểm tra."""
+
+    def __next__(self):
+        for value in self._in_block:
+            return value
+        while self._load_next_block():
+            for value in self._in_block:
+                return value
+        raise StopIteration()
+
+# Một "khúc" từ liên tiếp, KHÔNG sao chép dữ liệu: chỉ nhớ các đoạn (block, đầu, cuối).
+# Dùng được như một Sequence chỉ-đọc (len, chỉ số, duyệt).
+# Vì trỏ thẳng vào block đang sống, khúc nhớ version lúc tạo và fail-fast như
+# AlphabeticalOrderIterator nếu tập hợp bị sửa sau đó (muốn giữ lâu thì lấy từ snapshot()).
+class WordChunk(Sequence):
+    __slots__ = ('_segments', '_len', '_collection', '_expected_version')
+
+    def __init__(self, segments: list[tuple[list[str], int, int]], collection: '_SortedWordsView'):
+        self._segments = segments
+        self._len = sum(high - low for _, low, high in segments)
+        self._collection = collection
+        self._expected_version = collection._version
+
+    def _check_version(self):
+        if self._collection._version != self._expected_version:
+            raise RuntimeError("WordCollection đã bị thay đổi sau khi tạo WordChunk")
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, index: int) -> str:
+        if isinstance(index, slice):
+            return list(self)[index]
+        self._check_version()
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("WordChunk index out of range")
+        for block, low, high in self._segments:
+            if index < high - low:
+                return block[low + index]
+            index -= high - low
+
+    def __iter__(self) -> Iterator[str]:
+        collection, expected = self._collection, self._expected_version
+        for word in chain.from_iterable(islice(block, low, high) for block, low, high in self._segments):
+            if collection._version != expected:
+                raise RuntimeError("WordCollection đã bị thay đổi sau khi tạo WordChunk")
+            yield word
+
+def _map_chunk(fn: Callable[[str], object], words: list[str]) -> list:
+    # Hàm ở mức module để ProcessPoolExecutor pickle được
+    return [fn(word) for word in words]
 
 # --- 2. The Aggregate (Đối tượng "chứa" dữ liệu) ---
 # Lớp này chứa dữ liệu và có khả năng tạo ra các iterator.
@@ -35,28 +133,373 @@ class AlphabeticalOrderIterator(Iterator):
 Aggregate/Iterable là cái thùng chứa dữ liệu. Nhiệm vụ chính của nó là cung cấp
 một hoặc nhiều cách để duyệ qua dữ liệu đó bằng cách trả về một đối tượng Iterator
 từ phương thức __iter__()
+
+Các từ luôn được giữ ở trạng thái đã sắp xếp, nên duyệt không bao giờ phải sort.
+Thay vì một list lớn (chèn giữa list là O(n)), ta dùng danh sách các block nhỏ
+đã sắp xếp, kèm mảng _maxes (phần tử lớn nhất mỗi block) để bisect tìm block.
+Chèn = bisect tìm block + insort trong block ngắn; block quá dài thì tách đôi.
 """
-class WordCollection(Iterable):
-    def __init__(self):
-        self._words: list[str] = []
+class _SortedWordsView(Iterable):
+    """Phần chỉ-đọc dùng chung cho WordCollection và WordCollectionSnapshot."""
+    _blocks: list[list[str]]
+    _maxes: list[str]
+    _len: int
+    _version: int
+    _fail_fast = True # False cho các view bất biến: bỏ kiểm tra version khi duyệt
 
-    def add_word(self, word: str):
-        self._words.append(word)
+    def _iterator(self, *args) -> AlphabeticalOrderIterator:
+        iterator_class = AlphabeticalOrderIterator if self._fail_fast else _ImmutableOrderIterator
+        return iterator_class(self, *args)
+
+    def _lower_bound(self, word: str) -> tuple[int, int]:
+        """Vị trí của từ đầu tiên >= word."""
+        index = bisect_left(self._maxes, word)
+        if index == len(self._blocks):
+            return index, 0
+        return index, bisect_left(self._blocks[index], word)
+
+    def _upper_bound(self, word: str) -> tuple[int, int]:
+        """Vị trí của từ đầu tiên > word."""
+        index = bisect_right(self._maxes, word)
+        if index == len(self._blocks):
+            return index, 0
+        return index, bisect_right(self._blocks[index], word)
+
+    def __len__(self) -> int:
+        return self._len
 
-    def __iter__(self) -> AlphabeticalOrderIterator:
+    def __contains__(self, word: str) -> bool:
+        index, offset = self._lower_bound(word)
+        return index < len(self._blocks) and self._blocks[index][offset] == word
+
+    def __iter__(self) -> Iterator[str]:
         """
         Đây là phương thức được gọi khi vòng lặp 'for' bắt đầu.
         Nó trả về một đối tượng iterator mới.
         """
-        # Sắp xếp các từ trước khi duyệt
-        self._words.sort()
-        return AlphabeticalOrderIterator(self)
-    
-    def get_reverse_iterator(self) -> AlphabeticalOrderIterator:
+        # Các từ đã luôn được sắp xếp, không cần sort trước khi duyệt.
+        # Duyệt toàn bộ không cần quản lý khoảng [start, stop) như AlphabeticalOrderIterator,
+        # nên đi thẳng qua các block: view bất biến giao hẳn cho chain (mã C),
+        # view có thể sửa thì dùng generator kiểm tra version từng phần tử.
+        if not self._fail_fast:
+            return chain.from_iterable(self._blocks)
+        return self._walk_checked(self._blocks, iter, self._version)
+
+    def get_reverse_iterator(self) -> Iterator[str]:
         """Cung cấp một cách duyệt khác."""
-        self._words.sort()
-        return AlphabeticalOrderIterator(self, reverse=True)
+        if not self._fail_fast:
+            return chain.from_iterable(map(reversed, reversed(self._blocks)))
+        return self._walk_checked(reversed(self._blocks), reversed, self._version)
+
+    def _walk_checked(self, blocks: Iterable[list[str]], walk_block: Callable[[list[str]], Iterator[str]],
+                      version: int) -> Iterator[str]:
+        # version truyền vào lúc gọi (thân generator chỉ chạy ở lần next() đầu tiên)
+        for block in blocks:
+            for word in walk_block(block):
+                if self._version != version:
+                    raise RuntimeError("WordCollection đã bị thay đổi trong lúc duyệt")
+                yield word
+        if self._version != version:
+            raise RuntimeError("WordCollection đã bị thay đổi trong lúc duyệt")
+
+    def words_between(self, low: str, high: str, reverse: bool = False) -> AlphabeticalOrderIterator:
+        """Duyệt các từ trong đoạn [low, high] (bao gồm hai đầu)."""
+        return self._iterator(reverse, self._lower_bound(low), self._upper_bound(high))
 
+    def words_with_prefix(self, prefix: str, reverse: bool = False) -> AlphabeticalOrderIterator:
+        """Duyệt các từ bắt đầu bằng prefix: chúng nằm liền nhau trong thứ tự đã sắp xếp."""
+        start = self._lower_bound(prefix)
+        # Chặn trên: prefix với ký tự cuối tăng thêm 1 ("ab" -> "ac")
+        stem = prefix
+        while stem and ord(stem[-1]) == 0x10FFFF:
+            stem = stem[:-1]
+        if not stem:
+            return self._iterator(reverse, start)
+        stop = self._lower_bound(stem[:-1] + chr(ord(stem[-1]) + 1))
+        return self._iterator(reverse, start, stop)
+
+
+    def chunks(self, size: int) -> Iterator[WordChunk]:
+        """Chia các từ (đã sắp xếp) thành các khúc `size` từ, không sao chép phần tử nào."""
+        if size <= 0:
+            raise ValueError("size phải > 0")
+        version = self._version
+        segments, remaining = [], size
+        for block in self._blocks:
+            low = 0
+            while low < len(block):
+                high = min(len(block), low + remaining)
+                segments.append((block, low, high))
+                remaining -= high - low
+                low = high
+                if remaining == 0:
+                    if self._version != version:
+                        raise RuntimeError("WordCollection đã bị thay đổi trong lúc duyệt")
+                    yield WordChunk(segments, self)
+                    segments, remaining = [], size
+        if segments:
+            if self._version != version:
+                raise RuntimeError("WordCollection đã bị thay đổi trong lúc duyệt")
+            yield WordChunk(segments, self)
+
+    def parallel_map(self, fn: Callable[[str], object], workers: int = None,
+                     chunk_size: int = 50_000) -> list:
+        """
+        Áp dụng fn cho mọi từ theo thứ tự đã sắp xếp, chia thành các khúc và chạy
+        trên process pool. Kết quả giữ đúng thứ tự. fn phải pickle được (hàm mức module).
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Mỗi khúc phải được tuần tự hóa sang tiến trình con nên đến đây mới tạo list
+            parts = executor.map(_map_chunk, [fn] * ((self._len + chunk_size - 1) // chunk_size),
+                                 (list(chunk) for chunk in self.chunks(chunk_size)))
+            return [result for part in parts for result in part]
+
+class WordCollection(_SortedWordsView):
+    _BLOCK_SIZE = 1000 # Block dài quá 2 lần giá trị này sẽ bị tách đôi
+
+    def __init__(self):
+        self._blocks: list[list[str]] = []
+        self._maxes: list[str] = []
+        self._len = 0
+        self._version = 0 # Tăng mỗi lần thay đổi, để iterator phát hiện sửa đổi
+        # Copy-on-write: _owned[i] = False nghĩa là block i đang dùng chung với một
+        # snapshot, phải sao chép block trước khi sửa.
+        self._owned: list[bool] = []
+
+    def add_word(self, word: str):
+        blocks, maxes = self._blocks, self._maxes
+        self._version += 1
+        if not blocks:
+            blocks.append([word])
+            maxes.append(word)
+            self._owned.append(True)
+        else:
+            index = bisect_right(maxes, word)
+            if index == len(maxes):
+                # Lớn hơn mọi từ hiện có: nối vào cuối block cuối
+                index -= 1
+                self._own(index)
+                blocks[index].append(word)
+                maxes[index] = word
+            else:
+                self._own(index)
+                insort(blocks[index], word)
+            if len(blocks[index]) > 2 * self._BLOCK_SIZE:
+                self._split(index)
+        self._len += 1
+
+    def add_words(self, words: Iterable[str]):
+        """Thêm nhiều từ một lúc: sắp xếp một lần rồi chia lại block, rẻ hơn chèn từng từ."""
+        merged = [word for block in self._blocks for word in block]
+        merged.extend(words)
+        merged.sort()
+        size = self._BLOCK_SIZE
+        self._blocks = [merged[i:i + size] for i in range(0, len(merged), size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._owned = [True] * len(self._blocks)
+        self._len = len(merged)
+        self._version += 1
+
+    def _split(self, index: int):
+        block = self._blocks[index]
+        half = block[self._BLOCK_SIZE:]
+        del block[self._BLOCK_SIZE:]
+        self._blocks.insert(index + 1, half)
+        self._maxes[index] = block[-1]
+        self._maxes.insert(index + 1, half[-1])
+        self._owned.insert(index + 1, True)
+
+    def _own(self, index: int):
+        if not self._owned[index]:
+            self._blocks[index] = list(self._blocks[index])
+            self._owned[index] = True
+
+    def snapshot(self) -> 'WordCollectionSnapshot':
+        """
+        Ảnh chụp bất biến, O(số block): chỉ sao chép danh sách block, các block
+        được dùng chung. Lần sửa sau mới sao chép đúng block bị sửa (copy-on-write).
+        """
+        self._owned = [False] * len(self._blocks)
+        return WordCollectionSnapshot(list(self._blocks), list(self._maxes), self._len)
+
+class WordCollectionSnapshot(_SortedWordsView):
+    """Bản chụp chỉ-đọc: duyệt thoải mái trong khi WordCollection gốc vẫn được sửa."""
+    _version = 0 # Không bao giờ đổi
+    _fail_fast = False
+
+    def __init__(self, blocks: list[list[str]], maxes: list[str], length: int):
+        self._blocks = blocks
+        self._maxes = maxes
+        self._len = length
+
+# --- Backend trên đĩa: từ đã sắp xếp nằm trong file, đọc qua mmap ---
+"""
+Hai file cho mỗi tập hợp:
+- <path>.dat: các từ UTF-8 nối liền nhau theo thứ tự đã sắp xếp
+- <path>.idx: N+1 offset kiểu uint64 (thứ tự byte của máy), từ thứ i là dat[idx[i]:idx[i+1]]
+
+Thứ tự byte của UTF-8 trùng với thứ tự code point của str, nên sắp xếp/trộn bytes
+cho kết quả giống hệt sort() trên str.
+Không có block thật trong RAM: _blocks và _maxes là các "dãy ảo" tính từ offset,
+nên AlphabeticalOrderIterator, words_between, words_with_prefix, chunks... dùng lại
+nguyên vẹn, và RAM chỉ còn là các trang mmap mà hệ điều hành tự quản lý.
+"""
+_RUN_RECORD = struct.Struct('<I') # Độ dài mỗi từ trong file run tạm
+
+def _write_run(path: str, words: Iterable[bytes]):
+    with open(path, 'wb') as f:
+        for data in words:
+            f.write(_RUN_RECORD.pack(len(data)))
+            f.write(data)
+
+def _read_run(path: str) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        while header := f.read(_RUN_RECORD.size):
+            yield f.read(_RUN_RECORD.unpack(header)[0])
+
+class _MappedBlock(Sequence):
+    """Block ảo: các từ [low, high) của DiskWordCollection, giải mã khi được đọc."""
+    __slots__ = ('_owner', '_low', '_high')
+
+    def __init__(self, owner: 'DiskWordCollection', low: int, high: int):
+        self._owner, self._low, self._high = owner, low, high
+
+    def __len__(self) -> int:
+        return self._high - self._low
+
+    def __getitem__(self, index):
+        positions = range(self._low, self._high)[index]
+        if isinstance(index, slice):
+            if positions.step == 1:
+                return _MappedBlock(self._owner, positions.start, positions.stop)
+            return [self._owner._word(i) for i in positions]
+        return self._owner._word(positions)
+
+    def __iter__(self) -> Iterator[str]:
+        offsets, blob = self._owner._offsets, self._owner._blob
+        start = offsets[self._low]
+        for i in range(self._low + 1, self._high + 1):
+            end = offsets[i]
+            yield blob[start:end].decode('utf-8')
+            start = end
+
+    def __reversed__(self) -> Iterator[str]:
+        offsets, blob = self._owner._offsets, self._owner._blob
+        end = offsets[self._high]
+        for i in range(self._high - 1, self._low - 1, -1):
+            start = offsets[i]
+            yield blob[start:end].decode('utf-8')
+            end = start
+
+class _MappedBlocks(Sequence):
+    """Danh sách block ảo, mỗi block _BLOCK_SIZE từ."""
+    __slots__ = ('_owner',)
+
+    def __init__(self, owner: 'DiskWordCollection'):
+        self._owner = owner
+
+    def __len__(self) -> int:
+        return -(-self._owner._len // self._owner._BLOCK_SIZE)
+
+    def _bounds(self, index: int) -> tuple[int, int]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("block index out of range")
+        size = self._owner._BLOCK_SIZE
+        return index * size, min(self._owner._len, (index + 1) * size)
+
+    def __getitem__(self, index: int) -> _MappedBlock:
+        return _MappedBlock(self._owner, *self._bounds(index))
+
+class _MappedMaxes(_MappedBlocks):
+    """Từ lớn nhất của mỗi block ảo, chỉ giải mã khi bisect chạm tới."""
+    __slots__ = ()
+
+    def __getitem__(self, index: int) -> str:
+        return self._owner._word(self._bounds(index)[1] - 1)
+
+class DiskWordCollection(_SortedWordsView):
+    """
+    WordCollection chỉ-đọc trên đĩa, cho bộ từ vựng lớn hơn RAM.
+    Tạo bằng DiskWordCollection.build(words, path) (external merge sort),
+    mở lại bằng DiskWordCollection(path). Nên dùng với `with` để đóng mmap.
+    """
+    _BLOCK_SIZE = 4096
+    _version = 0 # Không bao giờ đổi
+    _fail_fast = False
+
+    def __init__(self, path: str):
+        with open(path + '.idx', 'rb') as f:
+            self._index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(path + '.dat', 'rb') as f:
+            # mmap không nhận file rỗng (tập hợp chỉ gồm các từ rỗng hoặc không có từ nào)
+            size = os.fstat(f.fileno()).st_size
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._offsets = memoryview(self._index_map).cast('Q')
+        self._len = len(self._offsets) - 1
+        self._blocks = _MappedBlocks(self)
+        self._maxes = _MappedMaxes(self)
+
+    def _word(self, index: int) -> str:
+        return self._blob[self._offsets[index]:self._offsets[index + 1]].decode('utf-8')
+
+    def close(self):
+        self._offsets.release()
+        self._index_map.close()
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+
+    def __enter__(self) -> 'DiskWordCollection':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @classmethod
+    def build(cls, words: Iterable[str], path: str, run_size: int = 1_000_000,
+              fan_in: int = 256) -> 'DiskWordCollection':
+        """
+        External merge sort: chia words thành các run run_size từ, sắp xếp từng run
+        trong RAM rồi ghi ra file tạm, sau đó trộn (heapq.merge) tối đa fan_in run
+        một lượt cho tới khi ghi ra <path>.dat và <path>.idx.
+        RAM dùng tối đa cỡ một run, bất kể có bao nhiêu từ.
+        """
+        import tempfile
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.TemporaryDirectory(dir=directory) as workdir:
+            runs, words = [], iter(words)
+            while batch := sorted(islice(words, run_size)):
+                runs.append(os.path.join(workdir, f'run{len(runs)}'))
+                _write_run(runs[-1], (word.encode('utf-8') for word in batch))
+            generation = 0
+            while len(runs) > fan_in:
+                merged = []
+                for i in range(0, len(runs), fan_in):
+                    merged.append(os.path.join(workdir, f'merge{generation}-{len(merged)}'))
+                    _write_run(merged[-1], heapq.merge(*map(_read_run, runs[i:i + fan_in])))
+                for run in runs:
+                    os.remove(run)
+                runs, generation = merged, generation + 1
+            cls._write_files(heapq.merge(*map(_read_run, runs)), path)
+        return cls(path)
+
+    @staticmethod
+    def _write_files(sorted_words: Iterable[bytes], path: str):
+        # Ghi ra file tạm rồi os.replace, để không bao giờ để lại cặp file dở dang
+        offsets, position = array('Q', [0]), 0
+        with open(path + '.dat.tmp', 'wb') as dat, open(path + '.idx.tmp', 'wb') as idx:
+            for data in sorted_words:
+                dat.write(data)
+                position += len(data)
+                offsets.append(position)
+                if len(offsets) >= 65536:
+                    offsets.tofile(idx)
+                    del offsets[:]
+            offsets.tofile(idx)
+        os.replace(path + '.dat.tmp', path + '.dat')
+        os.replace(path + '.idx.tmp', path + '.idx')
 
 # --- 3. The Client Code ---
 if __name__ == "__main__":
@@ -92,4 +535,37 @@ if __name__ == "__main__":
         while True:
             print(f"Phần tử tiếp theo: {next(my_iterator)}")
     except StopIteration:
-        print("Đã duyệt hết các phần tử.")
\ No newline at end of file
+        print("Đã duyệt hết các phần tử.")
+
+    print("\n--- Duyệt theo khoảng và theo tiền tố ---")
+    for word in ("Fifth", "Fig", "Seventh", "Sixth"):
+        collection.add_word(word)
+    print(f"Từ trong khoảng [F, G]: {list(collection.words_between('F', 'G'))}")
+    print(f"Từ bắt đầu bằng 'Fi': {list(collection.words_with_prefix('Fi'))}")
+    print(f"Từ bắt đầu bằng 'S' (ngược): {list(collection.words_with_prefix('S', reverse=True))}")
+
+    print("\n--- Sửa trong lúc duyệt: fail-fast và snapshot ---")
+    try:
+        for word in collection:
+            if word == "First":
+                collection.add_word("Eighth")
+    except RuntimeError as error:
+        print(f"Lỗi: {error}")
+    for word in collection.snapshot(): # Duyệt bản chụp, thoải mái sửa bản gốc
+        if word.startswith("F"):
+            collection.add_word(word.upper())
+    print(f"Sau khi thêm trong lúc duyệt snapshot: {list(collection)}")
+
+    print("\n--- Duyệt theo khúc và xử lý song song ---")
+    for chunk in collection.chunks(5):
+        print(f"Khúc {len(chunk)} từ: {list(chunk)}")
+    print(f"Độ dài từng từ (process pool): {collection.parallel_map(len, workers=2, chunk_size=4)}")
+
+    print("\n--- Tập hợp trên đĩa (mmap), dựng bằng external merge sort ---")
+    import tempfile
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'words')
+        with DiskWordCollection.build(collection, path, run_size=4) as disk_words:
+            print(f"Xuôi: {list(disk_words)}")
+            print(f"Ngược: {list(disk_words.get_reverse_iterator())}")
+            print(f"Bắt đầu bằng 'Fi': {list(disk_words.words_with_prefix('Fi'))}")
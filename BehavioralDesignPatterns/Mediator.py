@@ -12,6 +12,7 @@ Client: Chỉ cần tạo ra một đối tượng AuthenticationDialog và sau
 
 from __future__ import annotations # k cần phải viết sender: 'BaseComponent'
 from abc import ABC
+from contextlib import contextmanager
 
 # --- 1. The Mediator Interface (và lớp Base Colleague) ---
 # Mediator sẽ điều phối giao tiếp giữa các Colleague.
@@ -90,25 +91,77 @@ class AuthenticationDialog(Mediator):
         self.login_button.set_mediator(self)
         print("Dialog created and components are linked to it.")
 
+        # Bảng định tuyến sự kiện -> handler, thay cho chuỗi if/elif.
+        # Sự kiện không có trong bảng (ví dụ checkbox_changed) thì bỏ qua.
+        # Mỗi handler nhận danh sách các sender đã phát sự kiện đó.
+        self._handlers = {
+            "text_changed": self._on_text_changed,
+            "button_clicked": self._on_button_clicked,
+        }
+        # Gom sự kiện trong batch(): khóa (sender, event) để loại trùng, dict giữ thứ tự đến
+        self._batch_depth = 0
+        self._pending: dict[tuple[BaseComponent, str], None] = {}
+
     def notify(self, sender: BaseComponent, event: str):
         """Đây là nơi tất cả logic điều phối được tập trung."""
+        if self._batch_depth:
+            print(f"Dialog (Mediator): Queued event '{event}' from '{type(sender).__name__}'.")
+            self._pending[(sender, event)] = None
+            return
         print(f"Dialog (Mediator): Received event '{event}' from '{type(sender).__name__}'.")
-        
-        if event == "text_changed":
-            # Nếu cả 2 ô có nội dung mới bật nút login.
-            if self.username_box.text and self.password_box.text:
-                print("Dialog: Both fields have text. Enabling button.")
-                self.login_button.is_enabled = True
-            else:
-                print("Dialog: One or more fields are empty. Disabling button.")
-                self.login_button.is_enabled = False
-        
-        elif event == "button_clicked":
-            if self.login_button.is_enabled:
-                print("Dialog: Attempting login...")
-                # ... (thực hiện logic đăng nhập) ...
-            else:
-                print("Dialog: Login button is disabled.")
+        self._dispatch(event, [sender])
+
+    def _dispatch(self, event: str, senders: list[BaseComponent]):
+        handler = self._handlers.get(event)
+        if handler is not None:
+            handler(senders)
+
+    @contextmanager
+    def batch(self):
+        """
+        Gom các sự kiện (ví dụ khi điền cả form) rồi điều phối một lần khi thoát khối with:
+        trùng (sender, event) chỉ tính một lần, mỗi loại sự kiện chỉ chạy handler một lần.
+        Có thể lồng nhau; chỉ khối ngoài cùng mới điều phối.
+        Nếu khối with ném lỗi thì bỏ các sự kiện đang gom, không điều phối nửa chừng.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._pending = {}
+            raise
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self._flush()
+
+    def _flush(self):
+        pending, self._pending = self._pending, {}
+        senders_by_event: dict[str, list[BaseComponent]] = {}
+        for sender, event in pending:
+            if event not in self._handlers:
+                continue # Không có handler (ví dụ checkbox_changed): không cần điều phối
+            senders_by_event.setdefault(event, []).append(sender)
+        for event, senders in senders_by_event.items():
+            print(f"Dialog (Mediator): Coordinating batched event '{event}' from {len(senders)} sender(s).")
+            self._dispatch(event, senders)
+
+    def _on_text_changed(self, senders: list[BaseComponent]):
+        # Nếu cả 2 ô có nội dung mới bật nút login.
+        if self.username_box.text and self.password_box.text:
+            print("Dialog: Both fields have text. Enabling button.")
+            self.login_button.is_enabled = True
+        else:
+            print("Dialog: One or more fields are empty. Disabling button.")
+            self.login_button.is_enabled = False
+
+    def _on_button_clicked(self, senders: list[BaseComponent]):
+        if self.login_button.is_enabled:
+            print("Dialog: Attempting login...")
+            # ... (thực hiện logic đăng nhập) ...
+        else:
+            print("Dialog: Login button is disabled.")
 
 # --- 4. The Client Code ---
 if __name__ == "__main__":
@@ -129,4 +182,13 @@ if __name__ == "__main__":
     print(f"Login button enabled? {dialog.login_button.is_enabled}")
 
     print("\nUser clicks login button:")
-    dialog.login_button.click()
\ No newline at end of file
+    dialog.login_button.click()
+
+    print("\nAuto-fill the whole form in one batch:")
+    dialog = AuthenticationDialog()
+    with dialog.batch():
+        dialog.username_box.text = "admin"
+        dialog.username_box.text = "admin2" # Trùng (sender, event): chỉ tính một lần
+        dialog.password_box.text = "secret"
+        dialog.remember_me_checkbox.check()
+    print(f"Login button enabled? {dialog.login_button.is_enabled}")
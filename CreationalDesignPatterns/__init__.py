@@ -0,0 +1,28 @@
+"""
+Các mẫu thiết kế nhóm Creational. Mỗi mẫu là một module riêng và chỉ được import
+ở lần truy cập đầu tiên (module __getattr__, PEP 562), nên
+`import CreationalDesignPatterns` gần như không tốn gì.
+
+Kiểm tra chi phí import:
+    python -X importtime -c "import CreationalDesignPatterns"
+"""
+import importlib
+
+__all__ = [
+    "AbstractFactory",
+    "Builder",
+    "FactoryMethod",
+    "Prototype",
+    "SimpleFactory",
+    "Singleton",
+]
+
+def __getattr__(name: str):
+    if name in __all__:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module # Lần sau truy cập thẳng, không qua __getattr__ nữa
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,4 +1,22 @@
 from abc import ABC, abstractmethod
+from array import array
+from operator import add
+from typing import Callable, Sequence
+import sys
+import time
+
+_numpy_module = False # False = chưa thử import, None = không có NumPy
+
+def _numpy():
+    """Import NumPy ở lần dùng đầu tiên để import module này không tốn thêm thời gian."""
+    global _numpy_module
+    if _numpy_module is False:
+        try:
+            import numpy
+        except ImportError:  # Không có NumPy thì dùng array của thư viện chuẩn
+            numpy = None
+        _numpy_module = numpy
+    return _numpy_module
 
 # --- Giao diện mục tiêu mà hệ thống cần ---
 class ICanonicalShape(ABC):
@@ -24,42 +42,298 @@ class Quad:
 
 # --- MỘT ADAPTER DUY NHẤT, LINH HOẠT ---
 class UniversalShapeAdapter(ICanonicalShape):
-    def __init__(self, shape_object):
+    def __init__(self, shape_object, registry: 'ShapeConverterRegistry' = None):
         # Adapter này "bọc" một đối tượng bất kỳ.
         self._shape = shape_object
+        self._registry = registry # None = shape_registry dùng chung (định nghĩa bên dưới)
 
     def get_vertices(self) -> list[tuple]:
         """
-        Đây là nơi phép màu xảy ra. Adapter sẽ kiểm tra xem nó đang
-        bọc đối tượng nào để có cách "dịch" phù hợp.
+        Đây là nơi phép màu xảy ra. Adapter tra bảng shape_registry theo kiểu
+        của đối tượng đang bọc để có cách "dịch" phù hợp; loại hình mới chỉ cần register().
         """
         print(f"Adapter: Đang chuyển đổi cho đối tượng kiểu '{type(self._shape).__name__}'...")
-        
-        # Kiểm tra xem có phải là RectangleA không?
-        if isinstance(self._shape, RectangleA):
-            # Logic dịch cho RectangleA
-            x, y, w, h = self._shape.x, self._shape.y, self._shape.width, self._shape.height
-            return [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
-
-        # Kiểm tra xem có phải là RectangleB không?
-        elif isinstance(self._shape, RectangleB):
-            # Logic dịch cho RectangleB
-            x1, y1, x2, y2 = self._shape.x1, self._shape.y1, self._shape.x2, self._shape.y2
-            return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
-
-        # Kiểm tra xem có phải là Quad không?
-        elif hasattr(self._shape, 'get_corners'):
-            # Logic dịch cho Quad
-            return self._shape.get_corners()
-            
+        return (self._registry or shape_registry).convert(self._shape)
+
+def _convert_by_isinstance_chain(shape) -> list[tuple]:
+    """Cách dịch cũ (chỉ còn để benchmark): dò lần lượt từng kiểu, càng nhiều kiểu càng chậm."""
+    # Kiểm tra xem có phải là RectangleA không?
+    if isinstance(shape, RectangleA):
+        # Logic dịch cho RectangleA
+        x, y, w, h = shape.x, shape.y, shape.width, shape.height
+        return [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+
+    # Kiểm tra xem có phải là RectangleB không?
+    elif isinstance(shape, RectangleB):
+        # Logic dịch cho RectangleB
+        x1, y1, x2, y2 = shape.x1, shape.y1, shape.x2, shape.y2
+        return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+    # Kiểm tra xem có phải là Quad không?
+    elif hasattr(shape, 'get_corners'):
+        # Logic dịch cho Quad
+        return shape.get_corners()
+
+    else:
+        raise TypeError("Loại hình học không được hỗ trợ bởi UniversalShapeAdapter")
+
+# --- BẢNG TRA (REGISTRY) THAY CHO CHUỖI isinstance ---
+class ShapeConverterRegistry:
+    """
+    Ánh xạ kiểu hình -> hàm chuyển đổi. Tra cứu theo type(obj) là O(1),
+    lớp con được dò theo MRO một lần rồi ghi nhớ lại.
+    Thêm loại hình mới chỉ cần register(), không phải sửa adapter.
+    """
+    def __init__(self):
+        self._converters: dict[type, Callable] = {}
+        # Kết quả đã dò MRO: type -> converter (kể cả lớp con, lớp duck-typing)
+        self._resolved: dict[type, Callable] = {}
+
+    def register(self, shape_type: type, converter: Callable = None):
+        """Dùng trực tiếp register(T, fn) hoặc làm decorator @register(T)."""
+        def decorator(fn: Callable) -> Callable:
+            self._converters[shape_type] = fn
+            # Đăng ký mới có thể thay đổi kết quả dò MRO của lớp con -> xóa cache
+            self._resolved.clear()
+            return fn
+        if converter is not None:
+            return decorator(converter)
+        return decorator
+
+    def resolve(self, shape_type: type) -> Callable:
+        try:
+            return self._resolved[shape_type]
+        except KeyError:
+            pass
+        for klass in shape_type.__mro__:
+            if klass in self._converters:
+                converter = self._converters[klass]
+                break
         else:
-            raise TypeError("Loại hình học không được hỗ trợ bởi UniversalShapeAdapter")
+            # Giữ hành vi duck-typing của adapter cũ: cứ có get_corners() là dùng được
+            if hasattr(shape_type, 'get_corners'):
+                converter = _quad_to_vertices
+            else:
+                raise TypeError(f"Loại hình học '{shape_type.__name__}' chưa được đăng ký")
+        self._resolved[shape_type] = converter
+        return converter
+
+    def convert(self, shape) -> list[tuple]:
+        # Đường nóng: một lần tra dict, chỉ rơi xuống resolve() khi gặp kiểu mới
+        converter = self._resolved.get(type(shape))
+        if converter is None:
+            converter = self.resolve(type(shape))
+        return converter(shape)
+
+shape_registry = ShapeConverterRegistry()
+
+@shape_registry.register(RectangleA)
+def _rect_a_to_vertices(shape: RectangleA) -> list[tuple]:
+    x, y, w, h = shape.x, shape.y, shape.width, shape.height
+    return [(x, y), (x + w, y), (x + w, y + h), (x, y + h)]
+
+@shape_registry.register(RectangleB)
+def _rect_b_to_vertices(shape: RectangleB) -> list[tuple]:
+    x1, y1, x2, y2 = shape.x1, shape.y1, shape.x2, shape.y2
+    return [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+
+@shape_registry.register(Quad)
+def _quad_to_vertices(shape) -> list[tuple]:
+    return shape.get_corners()
+
+class RegistryShapeAdapter(UniversalShapeAdapter):
+    """Giống UniversalShapeAdapter nhưng không print, dùng cho vòng lặp nóng."""
+    def get_vertices(self) -> list[tuple]:
+        return (self._registry or shape_registry).convert(self._shape)
+
+def benchmark_dispatch(n: int = 1_000_000, repeat: int = 3):
+    """
+    So sánh chuỗi isinstance cũ với registry trên một danh sách hình trộn lẫn.
+    Với 3 nhánh như ở đây, chênh lệch nhỏ (registry vẫn phải gọi thêm một hàm chuyển đổi);
+    lợi ích chính là chi phí O(1) không tăng theo số loại hình, và thêm loại mới không sửa adapter.
+    """
+    import gc
+
+    class Square(RectangleA):
+        def __init__(self, x, y, size):
+            super().__init__(x, y, size, size)
+
+    prototypes = [RectangleA(1, 2, 3, 4), RectangleB(0, 0, 5, 5), Quad(), Square(0, 0, 2)]
+    shapes = [prototypes[i % len(prototypes)] for i in range(n)]
+
+    def best_time(convert) -> float:
+        # Lấy lần nhanh nhất, tắt GC để hai phía không phải trả chi phí dọn rác của nhau
+        best = float("inf")
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for shape in shapes:
+                    convert(shape)
+                best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+        return best
+
+    chain_time = best_time(_convert_by_isinstance_chain)
+    registry_time = best_time(shape_registry.convert)
+
+    print(f"Benchmark {n:,} hình (tốt nhất trong {repeat} lần):")
+    print(f"  - Chuỗi isinstance: {chain_time:.3f}s")
+    print(f"  - Registry:         {registry_time:.3f}s (x{chain_time / registry_time:.2f})")
+
+# --- CACHE ĐỈNH CHO HÌNH KHÔNG ĐỔI ---
+# Hai cách để adapter biết hình đã bị sửa hay chưa:
+#   1. Biến thể "đóng băng" (__slots__, cấm gán lại) -> tính một lần là xong.
+#   2. Hình có "tem phiên bản" _version, tăng mỗi lần gán thuộc tính.
+class _FrozenShape:
+    __slots__ = ()
+    _frozen = True
+
+    def _init_fields(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"'{type(self).__name__}' là bất biến, không thể gán '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"'{type(self).__name__}' là bất biến, không thể xóa '{name}'")
+
+class FrozenRectangleA(_FrozenShape):
+    __slots__ = ('x', 'y', 'width', 'height')
+
+    def __init__(self, x, y, width, height):
+        self._init_fields(x, y, width, height)
+
+class FrozenRectangleB(_FrozenShape):
+    __slots__ = ('x1', 'y1', 'x2', 'y2')
+
+    def __init__(self, x1, y1, x2, y2):
+        self._init_fields(x1, y1, x2, y2)
+
+class FrozenQuad(_FrozenShape, Quad):
+    __slots__ = ()
+
+shape_registry.register(FrozenRectangleA, _rect_a_to_vertices)
+shape_registry.register(FrozenRectangleB, _rect_b_to_vertices)
+
+class VersionStamped:
+    """Mixin: mỗi lần gán thuộc tính thì tăng _version lên 1."""
+    _version = 0
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, '_version', self._version + 1)
+
+class VersionedRectangleA(VersionStamped, RectangleA):
+    pass
+
+class VersionedRectangleB(VersionStamped, RectangleB):
+    pass
+
+_NO_STAMP = object()   # Hình không có cách nào phát hiện thay đổi
+_NOT_CACHED = object() # Chưa tính lần nào
+
+class CachingShapeAdapter(ICanonicalShape):
+    """
+    Adapter có cache (opt-in): chỉ tính đỉnh lại khi hình thật sự thay đổi.
+    - Hình đóng băng: tính đúng một lần.
+    - Hình có _version: tính lại khi tem phiên bản đổi.
+    - Hình thường: luôn tính lại, trừ khi assume_immutable=True.
+    Danh sách trả về được dùng chung giữa các lần gọi, client không được sửa nó.
+    """
+    def __init__(self, shape_object, registry: ShapeConverterRegistry = shape_registry,
+                 assume_immutable: bool = False):
+        self._shape = shape_object
+        self._converter = registry.resolve(type(shape_object))
+        self._assume_immutable = assume_immutable
+        self._cached_vertices: list[tuple] = None
+        self._cached_stamp = _NOT_CACHED
+        self.computations = 0 # Số lần thực sự phải tính đỉnh
+
+    def _current_stamp(self):
+        if self._assume_immutable or getattr(self._shape, '_frozen', False):
+            return 0
+        return getattr(self._shape, '_version', _NO_STAMP)
+
+    def get_vertices(self) -> list[tuple]:
+        stamp = self._current_stamp()
+        if stamp is not _NO_STAMP and stamp == self._cached_stamp:
+            return self._cached_vertices
+        self._cached_vertices = self._converter(self._shape)
+        self._cached_stamp = stamp
+        self.computations += 1
+        return self._cached_vertices
+
+# --- ADAPTER HÀNG LOẠT (BULK) CHO CỘT DỮ LIỆU HÌNH CHỮ NHẬT ---
+# Thay vì bọc từng RectangleA/RectangleB rồi trả về list tuple riêng lẻ,
+# ta nhận thẳng các cột tham số và trả về MỘT buffer liền mạch (N, 4, 2).
+# Thứ tự đỉnh giống hệt get_vertices(): (x1,y1), (x2,y1), (x2,y2), (x1,y2).
+def _as_float_array(column: Sequence[float]) -> array:
+    if isinstance(column, array) and column.typecode == 'd':
+        return column
+    return array('d', column)
+
+def bulk_vertices_from_corners(x1s: Sequence[float], y1s: Sequence[float],
+                               x2s: Sequence[float], y2s: Sequence[float]):
+    """
+    Dạng RectangleB: cột x1, y1, x2, y2 -> buffer đỉnh (N, 4, 2) kiểu float64.
+    Có NumPy: trả về ndarray. Không có: trả về memoryview (N, 4, 2) trên array('d').
+    """
+    n = len(x1s)
+    if not (len(y1s) == len(x2s) == len(y2s) == n):
+        raise ValueError("Các cột tham số phải có cùng độ dài")
+
+    np = _numpy()
+    if np is not None:
+        x1 = np.asarray(x1s, dtype=np.float64)
+        y1 = np.asarray(y1s, dtype=np.float64)
+        x2 = np.asarray(x2s, dtype=np.float64)
+        y2 = np.asarray(y2s, dtype=np.float64)
+        out = np.empty((n, 4, 2), dtype=np.float64)
+        out[:, 0, 0] = x1; out[:, 0, 1] = y1
+        out[:, 1, 0] = x2; out[:, 1, 1] = y1
+        out[:, 2, 0] = x2; out[:, 2, 1] = y2
+        out[:, 3, 0] = x1; out[:, 3, 1] = y2
+        return out
+
+    # Fallback: một array('d') phẳng 8*N phần tử, ghi từng "cột" bằng slice bước 8.
+    x1, y1, x2, y2 = (_as_float_array(col) for col in (x1s, y1s, x2s, y2s))
+    flat = array('d', [0.0]) * (8 * n)
+    flat[0::8] = x1; flat[1::8] = y1
+    flat[2::8] = x2; flat[3::8] = y1
+    flat[4::8] = x2; flat[5::8] = y2
+    flat[6::8] = x1; flat[7::8] = y2
+    if n == 0:
+        # memoryview không cast được shape có chiều bằng 0
+        return memoryview(flat)
+    return memoryview(flat).cast('B').cast('d', (n, 4, 2))
+
+def bulk_vertices_from_xywh(xs: Sequence[float], ys: Sequence[float],
+                            widths: Sequence[float], heights: Sequence[float]):
+    """Dạng RectangleA: cột x, y, width, height -> buffer đỉnh (N, 4, 2)."""
+    if len(widths) != len(xs) or len(heights) != len(ys):
+        raise ValueError("Các cột tham số phải có cùng độ dài")
+    np = _numpy()
+    if np is not None:
+        x = np.asarray(xs, dtype=np.float64)
+        y = np.asarray(ys, dtype=np.float64)
+        return bulk_vertices_from_corners(x, y, x + np.asarray(widths, dtype=np.float64),
+                                          y + np.asarray(heights, dtype=np.float64))
+    return bulk_vertices_from_corners(xs, ys, array('d', map(add, xs, widths)),
+                                      array('d', map(add, ys, heights)))
 
 # --- Client Code ---
 def draw_shape(shape: ICanonicalShape):
     vertices = shape.get_vertices()
     print(f"Client: Đã nhận được các đỉnh: {vertices}. Đang vẽ...")
 
+def draw_shapes_batch(vertex_buffer):
+    """Client xử lý nguyên một lô đỉnh (N, 4, 2) thay vì từng hình một."""
+    count = vertex_buffer.shape[0] if len(vertex_buffer.shape) == 3 else 0
+    print(f"Client: Đã nhận buffer {count} hình x 4 đỉnh. Đang vẽ cả lô...")
+
 # --- Cách sử dụng ---
 if __name__ == "__main__":
     # Tạo ra các đối tượng từ các thư viện khác nhau
@@ -80,4 +354,46 @@ if __name__ == "__main__":
     draw_shape(adapter_b)
 
     print("\n--- Vẽ hình tứ giác C ---")
-    draw_shape(adapter_c)
\ No newline at end of file
+    draw_shape(adapter_c)
+
+    # Loại hình mới chỉ cần đăng ký, không phải sửa adapter
+    class Triangle:
+        def __init__(self, a, b, c):
+            self.points = (a, b, c)
+
+    shape_registry.register(Triangle, lambda t: list(t.points))
+
+    print("\n--- Loại hình mới qua UniversalShapeAdapter ---")
+    draw_shape(UniversalShapeAdapter(Triangle((0, 0), (4, 0), (2, 3))))
+
+    print("\n--- Vẽ qua RegistryShapeAdapter (không print) ---")
+    for shape in (rect_a, rect_b, quad_c, Triangle((0, 0), (4, 0), (2, 3))):
+        draw_shape(RegistryShapeAdapter(shape))
+
+    print("\n--- Vẽ lại nhiều khung hình với CachingShapeAdapter ---")
+    cached_adapters = [
+        CachingShapeAdapter(FrozenRectangleA(10, 20, 100, 50)),
+        CachingShapeAdapter(FrozenRectangleB(0, 0, 200, 100)),
+        CachingShapeAdapter(FrozenQuad()),
+    ]
+    versioned_rect = VersionedRectangleA(0, 0, 10, 10)
+    versioned_adapter = CachingShapeAdapter(versioned_rect)
+    cached_adapters.append(versioned_adapter)
+    for frame in range(1000):
+        for adapter in cached_adapters:
+            adapter.get_vertices()
+    print(f"1000 khung hình, số lần tính đỉnh: {[a.computations for a in cached_adapters]}")
+    versioned_rect.width = 20 # Sửa hình -> tem phiên bản đổi -> tính lại đúng một lần
+    print(f"Sau khi sửa width: {versioned_adapter.get_vertices()} "
+          f"(tính {versioned_adapter.computations} lần)")
+
+    print("\n--- Vẽ hàng loạt từ cột tham số ---")
+    batch_a = bulk_vertices_from_xywh([10, 0], [20, 0], [100, 5], [50, 5])
+    batch_b = bulk_vertices_from_corners([0], [0], [200], [100])
+    draw_shapes_batch(batch_a)
+    draw_shapes_batch(batch_b)
+    print(f"Hình đầu tiên của lô A: {batch_a.tolist()[0]}")
+
+    if "--bench" in sys.argv:
+        print()
+        benchmark_dispatch()
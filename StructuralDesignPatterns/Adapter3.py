@@ -2,8 +2,12 @@
 kiểu tui có sẵn DataAggregator theo interface IAnalyticsDataSource để generate báo cáo đúng không
 mà SalesDatabase thì trả về data type không theo IAnalyticsDataSource nên phải có DatabaseAdapter để trả về data theo IAnalyticsDataSource
 """
+from __future__ import annotations
 from abc import ABC, abstractmethod
-import json
+from itertools import islice
+from collections.abc import Iterable, Iterator
+import threading
+import time
 
 # --- Giao diện mà hệ thống của bạn yêu cầu ---
 class IAnalyticsDataSource(ABC):
@@ -54,11 +58,265 @@ class DatabaseAdapter(IAnalyticsDataSource):
         # Chuyển đổi: [('key1', val1), ('key2', val2)] -> {'key1': val1, 'key2': val2}
         return dict(data)
 
+# --- PHIÊN BẢN STREAMING: xử lý dữ liệu lớn hơn bộ nhớ ---
+# fetch_metrics() phải trả về cả dict một lúc. Giao diện streaming dưới đây
+# trả về từng "khúc" (chunk) các dòng (metric, value), để aggregator
+# cộng dồn dần mà không bao giờ giữ toàn bộ dữ liệu trong RAM.
+class IStreamingAnalyticsDataSource(ABC):
+    @abstractmethod
+    def iter_metric_chunks(self, chunk_size: int = 10_000) -> Iterator[list[tuple[str, float]]]:
+        """Sinh ra các list (metric, value), mỗi list tối đa chunk_size dòng."""
+        pass
+
+class RunningAggregate:
+    """Tổng hợp tăng dần cho một metric: sum, count, min, max, mean. Bộ nhớ O(1)."""
+    __slots__ = ('total', 'count', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+        self.minimum = None
+        self.maximum = None
+
+    def update(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict:
+        return {'sum': self.total, 'count': self.count, 'min': self.minimum,
+                'max': self.maximum, 'mean': self.mean}
+
+def _chunked(rows: Iterable[tuple], chunk_size: int) -> Iterator[list[tuple]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+class StreamingDataAggregator:
+    """
+    Giống DataAggregator nhưng đọc dữ liệu theo từng chunk và cộng dồn.
+    Bộ nhớ chỉ tỉ lệ với số metric khác nhau, không tỉ lệ với số dòng.
+    Vẫn nhận được IAnalyticsDataSource cũ (bọc dict của nó thành một luồng).
+    """
+    def __init__(self, chunk_size: int = 10_000):
+        self._chunk_size = chunk_size
+
+    def aggregate(self, source) -> dict[str, RunningAggregate]:
+        if isinstance(source, IStreamingAnalyticsDataSource):
+            chunks = source.iter_metric_chunks(self._chunk_size)
+        else:
+            chunks = _chunked(source.fetch_metrics().items(), self._chunk_size)
+
+        aggregates: dict[str, RunningAggregate] = {}
+        for chunk in chunks:
+            for metric, value in chunk:
+                aggregate = aggregates.get(metric)
+                if aggregate is None:
+                    aggregate = aggregates[metric] = RunningAggregate()
+                aggregate.update(value)
+        return aggregates
+
+    def generate_report(self, source) -> None:
+        print("StreamingDataAggregator: Bắt đầu đọc số liệu theo từng chunk...")
+        aggregates = self.aggregate(source)
+
+        if aggregates:
+            print("="*20)
+            print("BÁO CÁO HÀNG THÁNG (STREAMING)")
+            for key, aggregate in aggregates.items():
+                print(f"- {key.capitalize()}: sum={aggregate.total:.2f}, count={aggregate.count}, "
+                      f"min={aggregate.minimum}, max={aggregate.maximum}, mean={aggregate.mean:.2f}")
+            print("="*20)
+        else:
+            print("Không thể lấy được số liệu.")
+
+# --- Nguồn dữ liệu lớn (Adaptee 2): CSDL SQLite cục bộ đóng vai kho bán hàng ---
+class SQLiteSalesDatabase:
+    def __init__(self, path: str = ":memory:"):
+        import sqlite3
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS sales (metric TEXT, value REAL)")
+
+    def insert_sales(self, rows: Iterable[tuple[str, float]]) -> None:
+        # executemany nhận generator nên việc nạp dữ liệu cũng không tốn RAM
+        with self._connection:
+            self._connection.executemany("INSERT INTO sales VALUES (?, ?)", rows)
+
+    def query_sales_cursor(self) -> sqlite3.Cursor:
+        print("(Streaming sales rows from SQLite...)")
+        return self._connection.execute("SELECT metric, value FROM sales")
+
+# --- Adapter streaming cho SQLiteSalesDatabase ---
+class SQLiteStreamingAdapter(IStreamingAnalyticsDataSource):
+    def __init__(self, database: SQLiteSalesDatabase):
+        self._database = database
+
+    def iter_metric_chunks(self, chunk_size: int = 10_000) -> Iterator[list[tuple[str, float]]]:
+        # "Dịch" cursor của CSDL sang luồng chunk, fetchmany chỉ giữ chunk_size dòng
+        cursor = self._database.query_sales_cursor()
+        try:
+            while rows := cursor.fetchmany(chunk_size):
+                yield rows
+        finally:
+            cursor.close()
+
+def _fake_sales_rows(n: int) -> Iterator[tuple[str, float]]:
+    import random
+    rng = random.Random(42)
+    for _ in range(n):
+        yield ('new_users', rng.randint(0, 20))
+        yield ('total_revenue', round(rng.uniform(5, 500), 2))
+
+# --- NHIỀU NGUỒN CHẠY SONG SONG + CACHE ---
+# Gọi fetch_metrics() của nhiều nguồn cùng lúc bằng thread pool (việc chờ I/O
+# không bị GIL cản), gộp kết quả lại, và cache số liệu từng nguồn.
+# Cache còn hiệu lực khi: nguồn có get_version() (kiểu ETag) thì phiên bản chưa đổi
+# (TTL không dùng); nguồn không có phiên bản thì chưa quá TTL.
+class _CacheEntry:
+    __slots__ = ('metrics', 'version', 'fetched_at')
+
+    def __init__(self, metrics: dict, version, fetched_at: float):
+        self.metrics = metrics
+        self.version = version
+        self.fetched_at = fetched_at
+
+class SourceStats:
+    __slots__ = ('hits', 'misses', 'last_fetch_seconds')
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.last_fetch_seconds = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+class MultiSourceDataAggregator:
+    def __init__(self, max_workers: int = 8, ttl_seconds: float = 60.0):
+        # Import muộn: concurrent.futures khá nặng, chỉ trả giá khi thật sự dùng
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._ttl = ttl_seconds
+        self._cache: dict[str, _CacheEntry] = {}
+        self._stats: dict[str, SourceStats] = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, name: str, source: IAnalyticsDataSource) -> dict:
+        get_version = getattr(source, 'get_version', None)
+        version = get_version() if get_version else None
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(name, SourceStats())
+            entry = self._cache.get(name)
+            if entry is None:
+                fresh = False
+            elif version is not None:
+                fresh = version == entry.version
+            else:
+                fresh = now - entry.fetched_at < self._ttl
+            if fresh:
+                stats.hits += 1
+                return entry.metrics
+
+        start = time.perf_counter()
+        metrics = source.fetch_metrics()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats.misses += 1
+            stats.last_fetch_seconds = elapsed
+            self._cache[name] = _CacheEntry(metrics, version, time.monotonic())
+        return metrics
+
+    def fetch_all(self, sources: dict[str, IAnalyticsDataSource]) -> dict[str, dict]:
+        futures = {name: self._executor.submit(self._fetch, name, source)
+                   for name, source in sources.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+    def invalidate(self, name: str = None) -> None:
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
+    def stats(self) -> dict[str, SourceStats]:
+        return dict(self._stats)
+
+    def generate_report(self, sources: dict[str, IAnalyticsDataSource]) -> dict:
+        print(f"MultiSourceDataAggregator: Lấy số liệu song song từ {len(sources)} nguồn...")
+        per_source = self.fetch_all(sources)
+
+        # Gộp: cộng các số liệu cùng tên từ mọi nguồn
+        merged: dict = {}
+        for metrics in per_source.values():
+            for key, value in (metrics or {}).items():
+                merged[key] = merged.get(key, 0) + value
+
+        print("="*20)
+        print("BÁO CÁO TỔNG HỢP NHIỀU NGUỒN")
+        for key, value in merged.items():
+            print(f"- {key.capitalize()}: {value}")
+        for name in sources:
+            stats = self._stats[name]
+            print(f"  [{name}] fetch gần nhất: {stats.last_fetch_seconds * 1000:.1f}ms, "
+                  f"cache hit rate: {stats.hit_rate:.0%}")
+        print("="*20)
+        return merged
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+# Một CSDL chậm (giả lập độ trễ mạng) có số phiên bản thay đổi khi dữ liệu đổi
+class RegionalSalesDatabase(SalesDatabase):
+    def __init__(self, region: str, latency: float = 0.2):
+        self.region = region
+        self.latency = latency
+        self.version = 1
+
+    def query_monthly_sales(self) -> list[tuple]:
+        time.sleep(self.latency)
+        return [('new_users', 100 * self.version), ('total_revenue', 1000.0 * self.version)]
+
+class RegionalDatabaseAdapter(DatabaseAdapter):
+    def get_version(self):
+        return self._database.version
+
 # --- Sử dụng trong hệ thống ---
-print("--- GIAI ĐOẠN 1: TÍCH HỢP CSDL ---")
-data_aggregator = DataAggregator()
-sales_db = SalesDatabase()
-db_adapter = DatabaseAdapter(sales_db)
+if __name__ == "__main__":
+    print("--- GIAI ĐOẠN 1: TÍCH HỢP CSDL ---")
+    data_aggregator = DataAggregator()
+    sales_db = SalesDatabase()
+    db_adapter = DatabaseAdapter(sales_db)
+
+    # Truyền adapter vào lớp lõi. Mọi thứ hoạt động trơn tru.
+    data_aggregator.generate_report(db_adapter)
+
+    print("\n--- GIAI ĐOẠN 2: STREAMING TỪ CSDL SQLITE ---")
+    sqlite_db = SQLiteSalesDatabase()
+    sqlite_db.insert_sales(_fake_sales_rows(100_000))
+    streaming_aggregator = StreamingDataAggregator(chunk_size=5_000)
+    streaming_aggregator.generate_report(SQLiteStreamingAdapter(sqlite_db))
+
+    # Nguồn cũ vẫn dùng được với aggregator mới
+    streaming_aggregator.generate_report(db_adapter)
 
-# Truyền adapter vào lớp lõi. Mọi thứ hoạt động trơn tru.
-data_aggregator.generate_report(db_adapter)
\ No newline at end of file
+    print("\n--- GIAI ĐOẠN 3: NHIỀU NGUỒN SONG SONG + CACHE ---")
+    regional_dbs = {region: RegionalSalesDatabase(region) for region in ("north", "south", "east", "west")}
+    regional_sources = {region: RegionalDatabaseAdapter(db) for region, db in regional_dbs.items()}
+    multi_aggregator = MultiSourceDataAggregator(max_workers=4)
+    for run in range(1, 4):
+        if run == 3:
+            regional_dbs["east"].version += 1 # Chỉ nguồn "east" đổi dữ liệu
+        start = time.perf_counter()
+        multi_aggregator.generate_report(regional_sources)
+        print(f"Lần chạy {run}: {time.perf_counter() - start:.2f}s")
+    multi_aggregator.shutdown()
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+import time
 
 # --- HỆ THỐNG PHÂN CẤP 1: IMPLEMENTATION (Các giao diện) ---
 
@@ -31,6 +32,27 @@ class DarkTheme(ITheme):
     def get_font_color(self) -> str:
         return "Màu trắng"
 
+class ThemeHandle(ITheme):
+    """
+    "Tay cầm" theme dùng chung: nhiều trang cùng trỏ vào một handle,
+    handle mới trỏ vào theme thật. Đổi theme cho mọi trang chỉ là một phép
+    gán O(1) trong swap(), không phải tạo lại từng trang.
+    version tăng mỗi lần swap để các bản render đã cache biết mà tính lại.
+    """
+    def __init__(self, theme: ITheme):
+        self.current = theme
+        self.version = 0
+
+    def swap(self, theme: ITheme) -> None:
+        self.current = theme
+        self.version += 1
+
+    def get_background_color(self) -> str:
+        return self.current.get_background_color()
+
+    def get_font_color(self) -> str:
+        return self.current.get_font_color()
+
 # --- HỆ THỐNG PHÂN CẤP 2: ABSTRACTION (Các trang web) ---
 
 class WebPage(ABC):
@@ -39,13 +61,33 @@ class WebPage(ABC):
     Nó chứa một tham chiếu đến một đối tượng Implementor (theme).
     Đây chính là "Cây cầu".
     """
+    _render_memo: tuple = None # (phiên bản theme, nội dung đã render)
+
     def __init__(self, theme: ITheme):
         self._theme = theme
+        if getattr(theme, 'version', None) is None:
+            # Theme thường không có version để nhớ kết quả: render() chính là get_content(),
+            # gán thẳng vào instance để không tốn thêm một tầng gọi hàm.
+            self.render = self.get_content
 
     @abstractmethod
     def get_content(self) -> str:
         pass
 
+    def render(self) -> str:
+        """
+        get_content() có nhớ kết quả khi theme có version (ThemeHandle): so version
+        để biết lúc nào phải render lại. Theme thường không báo được khi nó đổi,
+        nên luôn render lại (muốn cache theo lớp theme thì dùng ThemeRenderCache).
+        """
+        version = self._theme.version
+        memo = self._render_memo
+        if memo is not None and memo[0] == version:
+            return memo[1]
+        content = self.get_content()
+        self._render_memo = (version, content)
+        return content
+
 class AboutPage(WebPage):
     """Một Refined Abstraction."""
     def get_content(self) -> str:
@@ -60,6 +102,49 @@ class HomePage(WebPage):
                 f"  - Màu nền: {self._theme.get_background_color()}\n"
                 f"  - Màu chữ: {self._theme.get_font_color()}")
 
+# --- CACHE KẾT QUẢ RENDER THEO CẶP (Abstraction, Implementor) ---
+# Nội dung trang chỉ phụ thuộc vào cặp (lớp trang, lớp theme), nên có thể
+# render một lần rồi dùng lại, thay vì gọi theme và format chuỗi mỗi lần.
+# Đường "hit" chỉ gồm hai lần tra dict lồng nhau (lớp trang -> lớp theme -> nội dung),
+# không dựng tuple, không isinstance, không đếm: nếu không thì cache còn chậm hơn get_content().
+class ThemeRenderCache:
+    def __init__(self):
+        self._rendered: dict[type, dict[type, str]] = {}
+        self.misses = 0
+
+    def render(self, page: WebPage) -> str:
+        try:
+            return self._rendered[page.__class__][page._theme.__class__]
+        except KeyError:
+            return self._render_miss(page)
+
+    def _render_miss(self, page: WebPage) -> str:
+        theme = page._theme
+        if isinstance(theme, ThemeHandle):
+            # Trang dùng handle: cache theo theme thật đang gắn, không bao giờ lưu khóa ThemeHandle
+            theme = theme.current
+        by_theme = self._rendered.setdefault(type(page), {})
+        content = by_theme.get(type(theme))
+        if content is None:
+            self.misses += 1
+            content = by_theme[type(theme)] = page.get_content()
+        return content
+
+    def prerender(self, page_classes: list[type], themes: list[ITheme]) -> None:
+        """Render sẵn mọi tổ hợp trang x theme lúc khởi động cho các trang "nóng"."""
+        for page_class in page_classes:
+            by_theme = self._rendered.setdefault(page_class, {})
+            for theme in themes:
+                by_theme[type(theme)] = page_class(theme).get_content()
+
+    def invalidate_theme(self, theme_class: type = None) -> None:
+        """Gọi khi một theme thay đổi màu sắc: xóa mọi bản render dùng theme đó (None = xóa hết)."""
+        if theme_class is None:
+            self._rendered.clear()
+            return
+        for by_theme in self._rendered.values():
+            by_theme.pop(theme_class, None)
+
 # --- Client Code ---
 if __name__ == "__main__":
     # Tạo ra các đối tượng triển khai (các theme)
@@ -79,4 +164,38 @@ if __name__ == "__main__":
     about_dark = AboutPage(dark_theme)
     home_dark = HomePage(dark_theme)
     print(about_dark.get_content())
-    print(home_dark.get_content())
\ No newline at end of file
+    print(home_dark.get_content())
+
+    print("\n--- Render lặp lại với ThemeRenderCache ---")
+    render_cache = ThemeRenderCache()
+    render_cache.prerender([AboutPage, HomePage], [light_theme, dark_theme])
+    pages = [about_light, home_light, about_dark, home_dark]
+
+    n = 100_000
+    start = time.perf_counter()
+    for i in range(n):
+        pages[i % 4].get_content()
+    uncached_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(n):
+        render_cache.render(pages[i % 4])
+    cached_time = time.perf_counter() - start
+    print(f"{n:,} lần render: không cache {uncached_time:.3f}s, có cache {cached_time:.3f}s "
+          f"(misses={render_cache.misses})")
+
+    # Theme thay đổi -> xóa các bản render cũ của theme đó
+    render_cache.invalidate_theme(DarkTheme)
+    render_cache.render(home_dark)
+    print(f"Sau khi invalidate DarkTheme: misses={render_cache.misses}")
+
+    print("\n--- Đổi theme cho hàng loạt trang qua ThemeHandle ---")
+    shared_theme = ThemeHandle(light_theme)
+    live_pages = [HomePage(shared_theme) if i % 2 else AboutPage(shared_theme) for i in range(100_000)]
+    for page in live_pages:
+        page.render()
+    start = time.perf_counter()
+    shared_theme.swap(dark_theme) # Một phép gán duy nhất cho cả 100k trang
+    print(f"swap() mất {(time.perf_counter() - start) * 1e6:.1f}µs, version={shared_theme.version}")
+    print(live_pages[1].render())
+    print(render_cache.render(live_pages[0]))
@@ -1,3 +1,7 @@
+import threading
+import time
+from typing import Callable
+
 # --- 1. The Complex Subsystem (Hệ thống con phức tạp) ---
 # Đây là các lớp riêng lẻ mà client không muốn tương tác trực tiếp.
 class Amplifier:
@@ -17,33 +21,221 @@ class Projector:
     def off(self): print("Máy chiếu đã tắt")
     def wide_screen_mode(self): print("Máy chiếu đã chuyển sang chế độ màn ảnh rộng")
 
+# Thiết bị "giả" có độ trễ, dùng để thử facade như với thiết bị thật có I/O.
+class SimulatedLatency:
+    """Bọc một thiết bị bất kỳ: mỗi lời gọi phương thức đều ngủ `latency` giây trước."""
+    def __init__(self, device, latency: float):
+        self._device = device
+        self._latency = latency
+
+    def __getattr__(self, name):
+        method = getattr(self._device, name)
+        def call(*args, **kwargs):
+            time.sleep(self._latency)
+            return method(*args, **kwargs)
+        return call
+
+# --- Đồ thị các bước: bước nào không phụ thuộc nhau thì chạy song song ---
+class Step:
+    __slots__ = ('name', 'action', 'depends_on')
+
+    def __init__(self, name: str, action: Callable[[], None], depends_on: tuple[str, ...] = ()):
+        self.name = name
+        self.action = action
+        self.depends_on = tuple(depends_on)
+
+class StepGraphRunner:
+    """
+    Chạy một danh sách Step theo thứ tự phụ thuộc trên thread pool.
+    Một bước được gửi đi ngay khi mọi bước nó phụ thuộc đã xong.
+    Trả về thời gian chạy (giây) của từng bước.
+    """
+    def __init__(self, max_workers: int = 4):
+        self._max_workers = max_workers
+
+    @staticmethod
+    def _check_graph(steps: list[Step]) -> None:
+        names = {step.name for step in steps}
+        if len(names) != len(steps):
+            raise ValueError("Tên các bước bị trùng")
+        for step in steps:
+            missing = set(step.depends_on) - names
+            if missing:
+                raise ValueError(f"Bước '{step.name}' phụ thuộc vào bước không tồn tại: {sorted(missing)}")
+
+    def run(self, steps: list[Step]) -> dict[str, float]:
+        # Import muộn để import module không phải trả giá cho concurrent.futures
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        self._check_graph(steps)
+        timings: dict[str, float] = {}
+        timings_lock = threading.Lock()
+
+        def timed(step: Step) -> None:
+            start = time.perf_counter()
+            step.action()
+            with timings_lock:
+                timings[step.name] = time.perf_counter() - start
+
+        pending = {step.name: step for step in steps}
+        done: set[str] = set()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            while pending or running:
+                for name, step in list(pending.items()):
+                    if done.issuperset(step.depends_on):
+                        running[executor.submit(timed, step)] = name
+                        del pending[name]
+                if not running:
+                    raise ValueError(f"Đồ thị có vòng lặp phụ thuộc: {sorted(pending)}")
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result() # Ném lại lỗi của bước (nếu có)
+                    done.add(running.pop(future))
+        return timings
+
 # --- 2. The Facade (Lớp "bộ mặt") ---
 # Lớp này cung cấp một giao diện đơn giản để điều khiển toàn bộ hệ thống con.
 class HomeTheaterFacade:
-    def __init__(self, amp: Amplifier, dvd: DvdPlayer, projector: Projector):
+    # Tắt máy thì mất hết chế độ đã đặt, trừ những gì chắc chắn suy ra được từ việc tắt
+    # (DVD đã tắt thì không còn phát phim, nên end_movie() lần hai không gửi stop() nữa).
+    _POWER_OFF_STATE = {"dvd": {"playing": None}}
+
+    def __init__(self, amp: Amplifier, dvd: DvdPlayer, projector: Projector,
+                 runner: StepGraphRunner = None):
         # Facade chứa các tham chiếu đến các thành phần của hệ thống con.
         self._amplifier = amp
         self._dvd_player = dvd
         self._projector = projector
+        self._runner = runner or StepGraphRunner()
+        # Trạng thái cuối cùng đã biết của từng thiết bị, ví dụ {"power": True, "volume": 5}.
+        # Chỉ gửi lệnh khi trạng thái mong muốn khác trạng thái này.
+        self._device_state: dict[str, dict] = {"projector": {}, "amplifier": {}, "dvd": {}}
+        # Mỗi thiết bị một lock, giữ suốt "kiểm tra -> gửi lệnh -> ghi trạng thái" để hai bước
+        # chạy song song không cùng gửi một lệnh; các thiết bị khác nhau vẫn chạy song song.
+        self._device_locks = {device: threading.Lock() for device in self._device_state}
+        self._state_lock = threading.Lock() # Cho các bộ đếm
+        self.device_calls = 0   # Số lệnh thực sự gửi xuống thiết bị
+        self.skipped_calls = 0  # Số lệnh bỏ qua vì thiết bị đã ở đúng trạng thái
+
+    def _ensure(self, device: str, attribute: str, value, command: Callable[[], None]) -> None:
+        """Chỉ gửi `command` nếu thiết bị chưa ở trạng thái attribute == value."""
+        state = self._device_state[device]
+        with self._device_locks[device]:
+            if attribute in state and state[attribute] == value:
+                with self._state_lock:
+                    self.skipped_calls += 1
+                return
+            with self._state_lock:
+                self.device_calls += 1
+            command()
+            if attribute == "power" and not value:
+                state.clear()
+                state.update(self._POWER_OFF_STATE.get(device, {}))
+            state[attribute] = value
+
+    def resync(self) -> None:
+        """Quên trạng thái đã biết, lần gọi sau sẽ gửi lại toàn bộ lệnh."""
+        for device, state in self._device_state.items():
+            with self._device_locks[device]:
+                state.clear()
 
-    def watch_movie(self, movie: str):
+    def watch_movie(self, movie: str, force_resync: bool = False):
         """Phương thức đơn giản cho một hành động phức tạp."""
         print("Chuẩn bị xem phim...")
-        self._projector.on()
-        self._projector.wide_screen_mode()
-        self._amplifier.on()
-        self._amplifier.set_dvd()
-        self._amplifier.set_volume(5)
-        self._dvd_player.on()
-        self._dvd_player.play(movie)
-
-    def end_movie(self):
+        if force_resync:
+            self.resync()
+        self._ensure("projector", "power", True, self._projector.on)
+        self._ensure("projector", "wide_screen", True, self._projector.wide_screen_mode)
+        self._ensure("amplifier", "power", True, self._amplifier.on)
+        self._ensure("amplifier", "input", "dvd", self._amplifier.set_dvd)
+        self._ensure("amplifier", "volume", 5, lambda: self._amplifier.set_volume(5))
+        self._ensure("dvd", "power", True, self._dvd_player.on)
+        self._ensure("dvd", "playing", movie, lambda: self._dvd_player.play(movie))
+
+    def watch_movie_steps(self, movie: str) -> list[Step]:
+        """Cùng các bước như watch_movie(), nhưng khai báo rõ bước nào phải chờ bước nào."""
+        ensure = self._ensure
+        return [
+            Step("projector.on", lambda: ensure("projector", "power", True, self._projector.on)),
+            Step("projector.wide_screen_mode",
+                 lambda: ensure("projector", "wide_screen", True, self._projector.wide_screen_mode),
+                 ("projector.on",)),
+            Step("amplifier.on", lambda: ensure("amplifier", "power", True, self._amplifier.on)),
+            Step("amplifier.set_dvd", lambda: ensure("amplifier", "input", "dvd", self._amplifier.set_dvd),
+                 ("amplifier.on",)),
+            # Cùng một thiết bị thì vẫn giữ thứ tự lệnh như watch_movie()
+            Step("amplifier.set_volume",
+                 lambda: ensure("amplifier", "volume", 5, lambda: self._amplifier.set_volume(5)),
+                 ("amplifier.set_dvd",)),
+            Step("dvd.on", lambda: ensure("dvd", "power", True, self._dvd_player.on)),
+            Step("dvd.play", lambda: ensure("dvd", "playing", movie, lambda: self._dvd_player.play(movie)),
+                 ("dvd.on", "projector.wide_screen_mode", "amplifier.set_volume")),
+        ]
+
+    def run_steps(self, steps: list[Step]) -> dict[str, float]:
+        """Chạy một đồ thị bước bất kỳ và in thời gian của từng bước."""
+        start = time.perf_counter()
+        timings = self._runner.run(steps)
+        for name, seconds in timings.items():
+            print(f"  [{seconds * 1000:6.1f}ms] {name}")
+        print(f"  Tổng thời gian: {(time.perf_counter() - start) * 1000:.1f}ms")
+        return timings
+
+    def watch_movie_concurrently(self, movie: str, force_resync: bool = False) -> dict[str, float]:
+        """Như watch_movie() nhưng các thiết bị độc lập được khởi động song song."""
+        print("Chuẩn bị xem phim (song song)...")
+        if force_resync:
+            self.resync()
+        return self.run_steps(self.watch_movie_steps(movie))
+
+    def end_movie(self, force_resync: bool = False):
         """Một phương thức đơn giản khác."""
         print("\nKết thúc xem phim, tắt các thiết bị...")
-        self._dvd_player.stop()
-        self._dvd_player.off()
-        self._amplifier.off()
-        self._projector.off()
+        if force_resync:
+            self.resync()
+        self._ensure("dvd", "playing", None, self._dvd_player.stop)
+        self._ensure("dvd", "power", False, self._dvd_player.off)
+        self._ensure("amplifier", "power", False, self._amplifier.off)
+        self._ensure("projector", "power", False, self._projector.off)
+
+# Đếm số lệnh thật sự đến được thiết bị
+class CallCounter:
+    def __init__(self, device):
+        self._device = device
+        self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self._device, name)
+        def call(*args, **kwargs):
+            self.calls += 1
+            return method(*args, **kwargs)
+        return call
+
+def benchmark_device_calls() -> None:
+    """So sánh số lệnh gửi xuống thiết bị: luôn gửi hết (force_resync) vs chỉ gửi phần khác biệt."""
+    import contextlib
+    import io
+
+    def usage(theater: HomeTheaterFacade, force: bool) -> None:
+        # Kịch bản thường gặp: bấm xem nhiều lần, đổi phim, tắt, tắt lại, xem lại
+        for movie in ("Inception", "Inception", "Interstellar", "Interstellar"):
+            theater.watch_movie(movie, force_resync=force)
+        theater.end_movie(force_resync=force)
+        theater.end_movie(force_resync=force)
+        theater.watch_movie("Inception", force_resync=force)
+        theater.watch_movie("Inception", force_resync=force)
+
+    results = {}
+    for label, force in (("Luôn gửi hết", True), ("Chỉ gửi khác biệt", False)):
+        devices = [CallCounter(Amplifier()), CallCounter(DvdPlayer()), CallCounter(Projector())]
+        with contextlib.redirect_stdout(io.StringIO()):
+            usage(HomeTheaterFacade(*devices), force)
+        results[label] = sum(device.calls for device in devices)
+    for label, calls in results.items():
+        print(f"  {label}: {calls} lệnh")
+    saved = results["Luôn gửi hết"] - results["Chỉ gửi khác biệt"]
+    print(f"  Tiết kiệm: {saved} lệnh ({saved / results['Luôn gửi hết']:.0%})")
 
 # --- 3. The Client Code (Người dùng) ---
 # Client chỉ cần biết đến Facade.
@@ -60,4 +252,21 @@ if __name__ == "__main__":
     home_theater.watch_movie("Inception")
     
     # Và một phương thức duy nhất khác để kết thúc
-    home_theater.end_movie()
\ No newline at end of file
+    home_theater.end_movie()
+
+    print("\n--- Thiết bị chậm (100ms mỗi lệnh): tuần tự vs song song ---")
+    slow_theater = HomeTheaterFacade(SimulatedLatency(Amplifier(), 0.1),
+                                     SimulatedLatency(DvdPlayer(), 0.1),
+                                     SimulatedLatency(Projector(), 0.1))
+    start = time.perf_counter()
+    slow_theater.watch_movie("Inception")
+    print(f"Tuần tự: {(time.perf_counter() - start) * 1000:.1f}ms")
+    slow_theater.watch_movie_concurrently("Inception", force_resync=True)
+
+    print("\n--- Gọi lại watch_movie khi thiết bị đã sẵn sàng ---")
+    home_theater.watch_movie("Inception")
+    home_theater.watch_movie("Inception") # Không gửi lệnh nào nữa
+    print(f"Đã gửi {home_theater.device_calls} lệnh, bỏ qua {home_theater.skipped_calls} lệnh")
+
+    print("\n--- Benchmark số lệnh thiết bị ---")
+    benchmark_device_calls()
@@ -6,6 +6,13 @@ Client: Client không cần biết về RealDoor. Nó chỉ cần biết về Se
 """
 
 from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+import hashlib
+import hmac
+import os
+import threading
+import time
+from typing import Callable
 
 # --- 1. The Subject Interface (Giao diện chung) ---
 # Cả cửa thật và proxy bảo vệ đều phải tuân thủ giao diện này.
@@ -35,15 +42,16 @@ class SecurityProxy(IDoor):
         self._real_door = door
         self._password = "SECRET_PASSWORD"
 
-    def _authenticate(self, password: str) -> bool:
+    def _authenticate(self, password: str, caller: str = None) -> bool:
         """Kiểm tra mật khẩu trước khi cho phép hành động."""
-        return password == self._password
+        # compare_digest so sánh trong thời gian hằng, không lộ độ dài phần khớp qua timing
+        return hmac.compare_digest(password.encode(), self._password.encode())
 
-    def open(self, password: str):
+    def open(self, password: str, caller: str = None):
         """
         Client gọi phương thức open này, nhưng nó bị chặn lại bởi logic xác thực.
         """
-        if self._authenticate(password):
+        if self._authenticate(password, caller):
             print("Proxy: Mật khẩu chính xác. Cho phép mở cửa.")
             # Chỉ khi xác thực thành công, nó mới ủy quyền cho cửa thật.
             self._real_door.open()
@@ -56,6 +64,394 @@ class SecurityProxy(IDoor):
         self._real_door.close()
 
 
+# --- 3b. Proxy với bộ xác thực tùy chọn + cache kết quả xác thực ---
+class IPasswordVerifier(ABC):
+    @abstractmethod
+    def verify(self, password: str) -> bool:
+        pass
+
+class PlaintextVerifier(IPasswordVerifier):
+    """So sánh với mật khẩu gốc (chỉ để demo), vẫn so sánh thời gian hằng."""
+    def __init__(self, secret: str):
+        self._secret = secret.encode()
+
+    def verify(self, password: str) -> bool:
+        return hmac.compare_digest(password.encode(), self._secret)
+
+class SaltedHashVerifier(IPasswordVerifier):
+    """Chỉ lưu salt + PBKDF2-SHA256 của mật khẩu. Cố ý chậm để chống dò mật khẩu."""
+    def __init__(self, salt: bytes, digest: bytes, iterations: int = 200_000):
+        self._salt = salt
+        self._digest = digest
+        self._iterations = iterations
+
+    @classmethod
+    def from_password(cls, password: str, iterations: int = 200_000) -> 'SaltedHashVerifier':
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+        return cls(salt, digest, iterations)
+
+    def verify(self, password: str) -> bool:
+        candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), self._salt, self._iterations)
+        return hmac.compare_digest(candidate, self._digest)
+
+class AuthCache:
+    """
+    Cache có giới hạn (LRU) + TTL cho các lần xác thực THÀNH CÔNG gần đây.
+    Khóa là HMAC(caller, token) với khóa ngẫu nhiên của tiến trình,
+    nên cache không bao giờ giữ mật khẩu dạng rõ.
+    """
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 1024):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._key = os.urandom(32)
+        self._entries: OrderedDict[bytes, float] = OrderedDict() # khóa -> hạn dùng
+        self._lock = threading.Lock()
+
+    def _cache_key(self, caller: str, token: str) -> bytes:
+        return hmac.new(self._key, f"{caller}\0{token}".encode(), hashlib.sha256).digest()
+
+    def contains(self, caller: str, token: str) -> bool:
+        key = self._cache_key(caller, token)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def add(self, caller: str, token: str) -> None:
+        key = self._cache_key(caller, token)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self._ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+class VerifyingSecurityProxy(SecurityProxy):
+    """
+    SecurityProxy dùng IPasswordVerifier bất kỳ. Lần mở cửa lặp lại của cùng
+    caller/token trong thời gian TTL sẽ bỏ qua bước xác thực tốn kém.
+    """
+    def __init__(self, door: RealDoor, verifier: IPasswordVerifier, cache: AuthCache = None):
+        super().__init__(door)
+        self._password = None # Không dùng mật khẩu cố định của lớp cha, verifier lo việc xác thực
+        self._verifier = verifier
+        self._cache = cache or AuthCache()
+        # open() có thể được gọi từ nhiều luồng: các bộ đếm dùng chung một lock
+        self._metrics_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._verifications = 0
+        self._verification_seconds = 0.0
+
+    def _authenticate(self, password: str, caller: str = None) -> bool:
+        caller = caller or "anonymous"
+        if self._cache.contains(caller, password):
+            with self._metrics_lock:
+                self._cache_hits += 1
+            return True
+
+        start = time.perf_counter()
+        ok = self._verifier.verify(password) # Chạy ngoài lock: xác thực chậm không chặn luồng khác
+        elapsed = time.perf_counter() - start
+        with self._metrics_lock:
+            self._cache_misses += 1
+            self._verification_seconds += elapsed
+            self._verifications += 1
+        if ok:
+            self._cache.add(caller, password) # Chỉ cache kết quả thành công
+        return ok
+
+    def metrics(self) -> dict:
+        with self._metrics_lock:
+            hits, misses = self._cache_hits, self._cache_misses
+            verifications, seconds = self._verifications, self._verification_seconds
+        lookups = hits + misses
+        return {
+            "cache_hits": hits,
+            "cache_misses": misses,
+            "cache_hit_rate": hits / lookups if lookups else 0.0,
+            "verifications": verifications,
+            "avg_verification_ms": seconds / verifications * 1000 if verifications else 0.0,
+        }
+
+# --- 3c. Virtual Proxy: chỉ tạo cửa thật khi thật sự cần ---
+class VirtualDoorProxy(IDoor):
+    """
+    Trì hoãn việc tạo RealDoor (tốn kém) đến lần open()/close() đầu tiên.
+    Cửa không bao giờ được dùng thì không bao giờ phải trả chi phí khởi tạo.
+    """
+    def __init__(self, door_factory: Callable[[], IDoor] = RealDoor):
+        self._door_factory = door_factory
+        self._real_door: IDoor = None
+        self._lock = threading.Lock()
+
+    def _door(self) -> IDoor:
+        # Double-checked locking giống SingletonMeta: chỉ lock khi chưa tạo
+        if self._real_door is None:
+            with self._lock:
+                if self._real_door is None:
+                    print("VirtualProxy: Lần dùng đầu tiên, tạo cửa thật...")
+                    self._real_door = self._door_factory()
+        return self._real_door
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._real_door is not None
+
+    def open(self):
+        self._door().open()
+
+    def close(self):
+        self._door().close()
+
+# --- 3d. Remote Proxy: cửa thật nằm ở một tiến trình khác ---
+# Một tiến trình "door server" giữ hàng trăm cửa (tạo lười theo door_id).
+# Phía client chỉ mở MỘT pipe và dùng lại cho mọi cửa; call_many() gửi liền
+# nhiều yêu cầu rồi mới đọc kết quả (pipelining), đỡ phải chờ từng vòng.
+def _door_server_main(connection) -> None:
+    doors: dict[str, IDoor] = {}
+    while True:
+        message = connection.recv()
+        if message is None: # Tín hiệu dừng
+            break
+        request_id, door_id, method = message
+        try:
+            if method not in ("open", "close"):
+                raise AttributeError(f"IDoor không có phương thức '{method}'")
+            door = doors.get(door_id)
+            if door is None:
+                door = doors[door_id] = RealDoor()
+            getattr(door, method)()
+            connection.send((request_id, None))
+        except Exception as error:
+            connection.send((request_id, repr(error)))
+    connection.close()
+
+class RemoteDoorClient:
+    """Quản lý tiến trình door server và kết nối (dùng lại) tới nó."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_request_id = 0
+        self._start_server()
+
+    def _start_server(self) -> None:
+        import multiprocessing
+        self._connection, server_end = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_door_server_main, args=(server_end,), daemon=True)
+        self._process.start()
+        server_end.close()
+
+    def _reset_locked(self) -> None:
+        # Không còn biết pipe đang ở đâu trong luồng phản hồi: bỏ kết nối cũ, dựng server mới
+        self._connection.close()
+        self._process.terminate()
+        self._process.join()
+        self._start_server()
+
+    def call_many(self, calls: list[tuple[str, str]], window: int = 256) -> None:
+        """
+        Gửi cả lô (door_id, method), tối đa `window` yêu cầu đang chờ cùng lúc
+        (để bộ đệm pipe hai chiều không bị đầy gây kẹt), nhận kết quả theo thứ tự.
+        Nếu lỗi giữa chừng, các phản hồi còn treo được đọc bỏ (hoặc kết nối được dựng
+        lại) để lần gọi sau không nhận nhầm phản hồi của lô này.
+        """
+        errors = []
+        with self._lock:
+            in_flight = deque()
+            try:
+                for door_id, method in calls:
+                    if len(in_flight) >= window:
+                        self._receive(in_flight[0], errors)
+                        in_flight.popleft()
+                    self._next_request_id += 1
+                    self._connection.send((self._next_request_id, door_id, method))
+                    in_flight.append(self._next_request_id)
+                while in_flight:
+                    self._receive(in_flight[0], errors)
+                    in_flight.popleft()
+            except BaseException:
+                self._discard_locked(in_flight)
+                raise
+        if errors:
+            raise RuntimeError(f"Door server báo lỗi: {errors}")
+
+    def _discard_locked(self, in_flight: deque) -> None:
+        try:
+            while in_flight:
+                self._receive(in_flight[0], [])
+                in_flight.popleft()
+        except BaseException:
+            self._reset_locked()
+
+    def _receive(self, request_id: int, errors: list) -> None:
+        response_id, error = self._connection.recv()
+        if response_id != request_id:
+            raise ConnectionError(f"Phản hồi sai thứ tự: chờ {request_id}, nhận {response_id}")
+        if error:
+            errors.append(error)
+
+    def call(self, door_id: str, method: str) -> None:
+        self.call_many([(door_id, method)])
+
+    def proxy(self, door_id: str) -> 'RemoteDoorProxy':
+        return RemoteDoorProxy(self, door_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.send(None)
+            self._connection.close()
+        self._process.join()
+
+    def __enter__(self) -> 'RemoteDoorClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+class RemoteDoorProxy(IDoor):
+    """Client dùng như một IDoor bình thường, lời gọi được chuyển qua pipe."""
+    def __init__(self, client: RemoteDoorClient, door_id: str):
+        self._client = client
+        self._door_id = door_id
+
+    def open(self):
+        self._client.call(self._door_id, "open")
+
+    def close(self):
+        self._client.call(self._door_id, "close")
+
+# --- 3e. Caching Proxy tổng quát cho mọi interface ABC ---
+# Cho một ABC (IDoor, ITheme, IAnalyticsDataSource...) và một đối tượng thật,
+# caching_proxy() sinh ra lớp con của ABC đó: mỗi abstract method được ủy quyền
+# cho đối tượng thật và cache kết quả theo bộ tham số, với chính sách riêng từng method.
+class CachePolicy:
+    """
+    enabled=False: không cache (method có tác dụng phụ như open()).
+    ttl: số giây kết quả còn hiệu lực (None = mãi mãi). maxsize: số bộ tham số tối đa (LRU).
+    invalidates: gọi method này xong thì xóa cache của các method được liệt kê.
+    """
+    __slots__ = ('enabled', 'ttl', 'maxsize', 'invalidates')
+
+    def __init__(self, enabled: bool = True, ttl: float = None, maxsize: int = 128,
+                 invalidates: tuple[str, ...] = ()):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.invalidates = tuple(invalidates)
+
+NO_CACHE = CachePolicy(enabled=False)
+
+class MethodStats:
+    __slots__ = ('calls', 'hits', 'misses', 'total_seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.total_seconds = 0.0 # Thời gian chờ đối tượng thật (chỉ tính lúc miss)
+
+    def as_dict(self) -> dict:
+        return {"calls": self.calls, "hits": self.hits, "misses": self.misses,
+                "avg_ms": self.total_seconds / self.misses * 1000 if self.misses else 0.0}
+
+class _CachingProxyBase:
+    def __init__(self, subject, policies: dict[str, CachePolicy] = None,
+                 default_policy: CachePolicy = None):
+        self._subject = subject
+        self._policies = policies or {}
+        self._default_policy = default_policy or CachePolicy()
+        self._caches: dict[str, OrderedDict] = {}
+        self._stats: dict[str, MethodStats] = {}
+        self._invalidation_hooks: list[Callable[[str], None]] = []
+        self._cache_lock = threading.Lock()
+
+    def _proxy_call(self, name: str, args: tuple, kwargs: dict):
+        policy = self._policies.get(name, self._default_policy)
+        with self._cache_lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = MethodStats()
+            stats.calls += 1
+
+        key = None
+        if policy.enabled:
+            try:
+                key = (args, tuple(sorted(kwargs.items())))
+                hash(key)
+            except TypeError:
+                key = None # Tham số không hash được -> không cache lần gọi này
+        if key is not None:
+            with self._cache_lock:
+                cache = self._caches.setdefault(name, OrderedDict())
+                entry = cache.get(key)
+                if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                    cache.move_to_end(key)
+                    stats.hits += 1
+                    return entry[1]
+
+        start = time.perf_counter()
+        result = getattr(self._subject, name)(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        with self._cache_lock:
+            stats.misses += 1
+            stats.total_seconds += elapsed
+            if key is not None:
+                expires_at = time.monotonic() + policy.ttl if policy.ttl is not None else None
+                cache[key] = (expires_at, result)
+                cache.move_to_end(key)
+                while len(cache) > policy.maxsize:
+                    cache.popitem(last=False)
+        for target in policy.invalidates:
+            self.invalidate(target)
+        return result
+
+    def invalidate(self, method_name: str = None) -> None:
+        """Xóa cache của một method (hoặc tất cả) và báo cho các hook đã đăng ký."""
+        with self._cache_lock:
+            if method_name is None:
+                self._caches.clear()
+            else:
+                self._caches.pop(method_name, None)
+        for hook in self._invalidation_hooks:
+            hook(method_name)
+
+    def add_invalidation_hook(self, hook: Callable[[str], None]) -> None:
+        self._invalidation_hooks.append(hook)
+
+    def proxy_stats(self) -> dict[str, dict]:
+        with self._cache_lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+_proxy_classes: dict[type, type] = {}
+
+def _make_proxy_method(name: str):
+    def method(self, *args, **kwargs):
+        return self._proxy_call(name, args, kwargs)
+    method.__name__ = name
+    return method
+
+def caching_proxy(interface: type, subject, policies: dict[str, CachePolicy] = None,
+                  default_policy: CachePolicy = None):
+    """Tạo proxy có cache cho `subject`, proxy là một instance hợp lệ của `interface`."""
+    proxy_class = _proxy_classes.get(interface)
+    if proxy_class is None:
+        namespace = {name: _make_proxy_method(name) for name in interface.__abstractmethods__}
+        # Dùng metaclass của interface (ABCMeta) để lớp sinh ra vẫn là một ABC hợp lệ
+        proxy_class = type(interface)(f"Caching{interface.__name__}Proxy",
+                                      (_CachingProxyBase, interface), namespace)
+        _proxy_classes[interface] = proxy_class
+    return proxy_class(subject, policies, default_policy)
+
 # --- 4. The Client Code ---
 if __name__ == "__main__":
     # Tạo đối tượng thật
@@ -74,4 +470,64 @@ if __name__ == "__main__":
     security_door.open("SECRET_PASSWORD") # Lời gọi sẽ được ủy quyền cho cửa thật.
     
     print("\n--- Đóng cửa ---")
-    security_door.close()
\ No newline at end of file
+    security_door.close()
+
+    print("\n--- Proxy với mật khẩu băm + cache xác thực ---")
+    hashed_door = VerifyingSecurityProxy(RealDoor(), SaltedHashVerifier.from_password("SECRET_PASSWORD"))
+    hashed_door.open("WRONG_PASSWORD", caller="guard-1")
+    for _ in range(3):
+        hashed_door.open("SECRET_PASSWORD", caller="guard-1") # Chỉ lần đầu phải băm lại
+    print(f"Metrics: {hashed_door.metrics()}")
+
+    print("\n--- Virtual Proxy: chưa dùng thì chưa tạo cửa ---")
+    lazy_doors = [VirtualDoorProxy() for _ in range(100)]
+    lazy_doors[7].open()
+    print(f"Số cửa thật đã tạo: {sum(door.is_loaded for door in lazy_doors)}/100")
+
+    print("\n--- Remote Proxy: 200 cửa trong một tiến trình khác ---")
+    with RemoteDoorClient() as client:
+        remote_doors = [client.proxy(f"door-{i}") for i in range(200)]
+        remote_doors[0].open()
+        remote_doors[0].close()
+        start = time.perf_counter()
+        client.call_many([(f"door-{i}", "open") for i in range(200)])
+        print(f"Mở 200 cửa (pipelined): {(time.perf_counter() - start) * 1000:.1f}ms")
+        start = time.perf_counter()
+        for door in remote_doors:
+            door.close()
+        print(f"Đóng 200 cửa (từng lời gọi): {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    print("\n--- Caching proxy tổng quát ---")
+    class IPriceService(ABC):
+        @abstractmethod
+        def get_price(self, symbol: str) -> float:
+            pass
+
+        @abstractmethod
+        def refresh(self) -> None:
+            pass
+
+    class SlowPriceService(IPriceService):
+        def get_price(self, symbol: str) -> float:
+            time.sleep(0.05)
+            return {"VNM": 65.2, "FPT": 120.5}.get(symbol, 0.0)
+
+        def refresh(self) -> None:
+            print("SlowPriceService: Làm mới bảng giá.")
+
+    prices = caching_proxy(IPriceService, SlowPriceService(), policies={
+        "get_price": CachePolicy(ttl=30, maxsize=1000),
+        "refresh": CachePolicy(enabled=False, invalidates=("get_price",)),
+    })
+    for symbol in ("VNM", "FPT", "VNM", "VNM", "FPT"):
+        prices.get_price(symbol)
+    prices.refresh() # Xóa cache get_price
+    prices.get_price("VNM")
+    print(f"isinstance IPriceService: {isinstance(prices, IPriceService)}")
+    print(f"Thống kê: {prices.proxy_stats()}")
+
+    # Với IDoor, open/close có tác dụng phụ nên tắt cache, chỉ lấy thống kê
+    counted_door = caching_proxy(IDoor, RealDoor(), default_policy=NO_CACHE)
+    counted_door.open()
+    counted_door.open()
+    print(f"Thống kê cửa: {counted_door.proxy_stats()}")